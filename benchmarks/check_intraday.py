@@ -0,0 +1,90 @@
+"""
+Checks of the streaming intraday readers (src/intraday.py and
+data_loader.compute_log_returns_chunked) on synthetic minute bars.
+
+The bars are America/New_York sessions across the March 2021 DST change,
+written both as Parquet (tz-aware column) and as CSV (ISO timestamps whose
+UTC offset changes from -05:00 to -04:00):
+- the CSV must parse, and give the same daily measures as the Parquet file;
+- measures must not depend on the chunk size;
+- the overnight measure must be the squared return from each day's last bar
+  to the next day's first bar, and be part of the realized target;
+- chunked log returns must equal compute_log_returns on the whole series and
+  keep the requested time zone.
+Exits non-zero if any check fails.
+
+Usage:
+    python benchmarks/check_intraday.py
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import simulate_intraday_bars
+from intraday import daily_realized_measures, intraday_realized_vol
+from data_loader import compute_log_returns, compute_log_returns_chunked
+
+TZ = "America/New_York"
+
+def run_checks(workdir: str):
+    """Run every check; returns a list of (name, ok, detail) tuples."""
+    bars = simulate_intraday_bars("2021-03-08", n_days=10, tz=TZ)
+    parquet_path = os.path.join(workdir, "bars.parquet")
+    csv_path = os.path.join(workdir, "bars.csv")
+    bars.to_parquet(parquet_path)
+    bars.to_csv(csv_path, index=False)
+    results = []
+
+    try:
+        from_csv = daily_realized_measures(csv_path, chunk_rows=1000, tz=TZ)
+        error = None
+    except ValueError as exc:
+        from_csv, error = None, str(exc)
+    results.append(("CSV across DST parses", error is None, error or f"{len(from_csv)} days"))
+
+    from_parquet = daily_realized_measures(parquet_path, tz=TZ)
+    if from_csv is not None:
+        diff = float(np.abs(from_csv[["rv", "bv", "rk"]] - from_parquet[["rv", "bv", "rk"]]).max().max())
+        results.append(("CSV and Parquet measures agree", from_csv.index.equals(from_parquet.index)
+                        and diff < 1e-15, f"max abs diff {diff:.2e}"))
+    chunked = daily_realized_measures(parquet_path, chunk_rows=77, tz=TZ)
+    cols = ["rv", "bv", "rk", "overnight"]
+    results.append(("measures independent of chunk size",
+                    np.allclose(chunked[cols], from_parquet[cols], rtol=1e-12, equal_nan=True),
+                    f"{len(chunked)} days"))
+
+    logp = np.log(bars.set_index("timestamp")["close"])
+    by_day = logp.groupby(logp.index.tz_convert(TZ).normalize().tz_localize(None))
+    expected_overnight = ((by_day.first() - by_day.last().shift(1)) ** 2).to_numpy()
+    target = intraday_realized_vol(from_parquet)
+    ok = (np.isnan(from_parquet["overnight"].iloc[0])
+          and np.allclose(from_parquet["overnight"].to_numpy()[1:], expected_overnight[1:], rtol=1e-12)
+          and np.allclose(target.iloc[1:] ** 2, (from_parquet["rk"] + from_parquet["overnight"]).iloc[1:]))
+    results.append(("overnight return in realized target", bool(ok),
+                    f"mean overnight share {np.nanmean(from_parquet['overnight'] / target ** 2):.2f}"))
+
+    expected = compute_log_returns(bars.set_index("timestamp"))
+    for path in (parquet_path, csv_path):
+        out, n = compute_log_returns_chunked(path, os.path.join(workdir, "ret.parquet"),
+                                             chunk_rows=500, tz=TZ)
+        got = pd.read_parquet(out)
+        ok = (str(got["date"].dt.tz) == TZ and n == len(expected)
+              and np.array_equal(got["date"].to_numpy(), expected.index.to_numpy())
+              and np.allclose(got["log_ret"].to_numpy(), expected["log_ret"].to_numpy(), rtol=0, atol=1e-15))
+        results.append((f"chunked log returns ({os.path.splitext(path)[1][1:]})", ok,
+                        f"{n} returns, tz {got['date'].dt.tz}"))
+    return results
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_checks(workdir)
+    for name, ok, detail in results:
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<36} {detail}")
+    sys.exit(0 if all(ok for _, ok, _ in results) else 1)
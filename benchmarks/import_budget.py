@@ -0,0 +1,104 @@
+"""
+Import-time budget check for the src package.
+
+Every check runs in a fresh interpreter, so nothing is already imported:
+- `import main` must stay under the budget and load no heavy library
+  (pandas, numpy and the model/plotting/download libraries);
+- the library modules must import without loading any model, plotting or
+  download library (pandas/numpy are allowed there);
+- `python src/main.py --show`, which only reads the cached forecasts.csv,
+  must finish under the budget.
+Exits non-zero if any check fails.
+
+Usage:
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --budget 0.5 --repeat 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(BENCH_DIR, "..", "src"))
+FORECASTS_CSV = os.path.abspath(os.path.join(BENCH_DIR, "..", "results", "forecasts.csv"))
+
+# Loaded on first use only: fitting, testing, plotting and downloading
+MODEL_LIBRARIES = (
+    "arch", "hmmlearn", "sklearn", "scipy", "statsmodels",
+    "matplotlib", "seaborn", "yfinance",
+)
+# The CLI entry point must not even load the array stack
+ENTRY_LIBRARIES = MODEL_LIBRARIES + ("pandas", "numpy", "pyarrow")
+
+LIBRARY_MODULES = (
+    "pipeline", "dag", "data_loader", "panel_store", "garch_model", "garch_batch",
+    "garch_filter", "backtest", "regime_switching", "regime_filter", "hmm_engine",
+    "diagnostics", "forecast_tests", "fit_cache", "instrumentation", "intraday",
+)
+
+_PROBE = """
+import sys, time, json
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"seconds": elapsed, "modules": sorted({{m.split(".")[0] for m in sys.modules}})}}))
+"""
+
+def probe_import(module: str):
+    """Import `module` in a fresh interpreter; returns (seconds, top-level modules loaded)."""
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module)],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    report = json.loads(out.stdout.strip().splitlines()[-1])
+    return report["seconds"], set(report["modules"])
+
+def time_command(args, repeat: int = 3):
+    """Best wall time (seconds) of a command over `repeat` runs, interpreter startup included."""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        subprocess.run(args, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+def run_checks(budget: float = 1.0, repeat: int = 3):
+    """Run every check; returns a list of (name, ok, detail) tuples."""
+    results = []
+
+    seconds, loaded = probe_import("main")
+    heavy = sorted(loaded & set(ENTRY_LIBRARIES))
+    results.append(("import main", seconds < budget and not heavy,
+                    f"{seconds:.3f}s, heavy modules loaded: {heavy or 'none'}"))
+
+    for module in LIBRARY_MODULES:
+        if not os.path.exists(os.path.join(SRC_DIR, f"{module}.py")):
+            continue
+        seconds, loaded = probe_import(module)
+        heavy = sorted(loaded & set(MODEL_LIBRARIES))
+        results.append((f"import {module}", not heavy,
+                        f"{seconds:.3f}s, model libraries loaded: {heavy or 'none'}"))
+
+    if os.path.exists(FORECASTS_CSV):
+        seconds = time_command([sys.executable, os.path.join(SRC_DIR, "main.py"), "--show"], repeat)
+        results.append(("main.py --show", seconds < budget, f"{seconds:.3f}s wall"))
+    else:
+        results.append(("main.py --show", True, f"skipped: no {FORECASTS_CSV} yet"))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import-time budget of the src package.")
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="seconds allowed for `import main` and `main.py --show`")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of `main.py --show`; the fastest counts")
+    args = parser.parse_args()
+
+    results = run_checks(args.budget, args.repeat)
+    for name, ok, detail in results:
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<28} {detail}")
+    sys.exit(0 if all(ok for _, ok, _ in results) else 1)
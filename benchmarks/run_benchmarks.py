@@ -0,0 +1,250 @@
+"""
+Benchmark harness for the pipeline stages.
+
+Times download_asset (served from local CSVs through csv_provider),
+compute_log_returns, realized_volatility, evaluate_forecasts, fit_garch_models
+and fit_hmm_regimes on deterministic synthetic data (see synthetic.py), over a
+grid of series lengths and asset counts. Every case runs in a fresh process, so
+its peak RSS is its own; library imports and one small warm-up run of the stage
+happen before the timed call. Results are written as JSON.
+
+Usage:
+    python benchmarks/run_benchmarks.py --lengths 1000 10000 --assets 1 10
+    python benchmarks/run_benchmarks.py --stages fit_garch_models --lengths 2500 --output garch.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import multiprocessing as mp
+from importlib import metadata
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import simulate_garch_returns, simulate_regime_returns, prices_from_returns
+from instrumentation import peak_rss_mb
+
+STAGES = (
+    "download_asset",
+    "compute_log_returns",
+    "realized_volatility",
+    "evaluate_forecasts",
+    "fit_garch_models",
+    "fit_hmm_regimes",
+)
+# Libraries the src modules import lazily, on first use (see import_budget.py)
+WARMUP_MODULES = (
+    "scipy.stats", "scipy.special", "arch", "hmmlearn.hmm",
+    "sklearn.preprocessing", "pyarrow.parquet",
+)
+# Observations of the untimed warm-up run of each case
+WARMUP_OBS = 200
+# Model fits are skipped above this many observations (n_obs * n_assets) per case
+DEFAULT_MAX_FIT_OBS = 2_000_000
+# Cases above this many observations are skipped before any data is simulated
+# (the simulators hold a few float64 arrays of n_obs * n_assets)
+DEFAULT_MAX_CASE_OBS = 50_000_000
+
+# Each stage: setup(returns, workdir) -> args (untimed), run(*args) (timed)
+
+def _setup_download(returns, workdir):
+    from data_loader import csv_provider
+    prices = prices_from_returns(returns)
+    for ticker in prices.columns:
+        prices[[ticker]].rename(columns={ticker: "close"}).to_csv(
+            os.path.join(workdir, f"{ticker}.csv"), index_label="date"
+        )
+    end = (prices.index[-1] + pd.Timedelta(days=1)).strftime("%Y-%m-%d %H:%M")
+    return list(prices.columns), csv_provider(workdir), prices.index[0], end
+
+def _run_download(tickers, provider, start, end):
+    from data_loader import download_asset
+    for ticker in tickers:
+        download_asset(ticker, start=start, end=end, provider=provider)
+
+def _setup_log_returns(returns, workdir):
+    prices = prices_from_returns(returns)
+    return ([prices[[c]].rename(columns={c: "close"}) for c in prices.columns],)
+
+def _run_log_returns(price_frames):
+    from data_loader import compute_log_returns
+    for df in price_frames:
+        compute_log_returns(df)
+
+def _setup_series(returns, workdir):
+    return ([returns[c] for c in returns.columns], workdir)
+
+def _run_realized_vol(series, workdir):
+    from diagnostics import realized_volatility
+    for r in series:
+        realized_volatility(r)
+
+def _setup_evaluate(returns, workdir):
+    from diagnostics import realized_volatility
+    cases = []
+    for c in returns.columns:
+        # Per-date forecasts: a rolling 22-day volatility and two rescalings
+        vol = returns[c].rolling(22).std().shift(1) * 100.0
+        forecasts = pd.DataFrame({"GARCH11": vol, "EGARCH": vol * 1.05, "GJRGARCH": vol * 0.95})
+        cases.append((c, forecasts, realized_volatility(returns[c])))
+    return cases, workdir
+
+def _run_evaluate(cases, workdir):
+    from diagnostics import evaluate_forecasts, RV_WINDOW
+    for asset, forecasts, rv in cases:
+        evaluate_forecasts(forecasts, rv, asset, realized_window=RV_WINDOW, results_dir=workdir,
+                           figs_dir=workdir, make_figures=False)
+
+def _run_garch(series, workdir):
+    from garch_model import fit_garch_models
+    for r in series:
+        fit_garch_models(r, r.name, results_dir=workdir, figs_dir=workdir, make_figures=False)
+
+def _run_hmm(series, workdir):
+    from regime_switching import fit_hmm_regimes
+    for r in series:
+        fit_hmm_regimes(r, n_states=2, asset_name=r.name, results_dir=workdir,
+                        figs_dir=workdir, make_figures=False)
+
+BENCHES = {
+    "download_asset": (_setup_download, _run_download),
+    "compute_log_returns": (_setup_log_returns, _run_log_returns),
+    "realized_volatility": (_setup_series, _run_realized_vol),
+    "evaluate_forecasts": (_setup_evaluate, _run_evaluate),
+    "fit_garch_models": (_setup_series, _run_garch),
+    "fit_hmm_regimes": (_setup_series, _run_hmm),
+}
+
+def _run_case(stage: str, data_path: str):
+    """Worker entry point: set up, then time one stage on the pickled returns."""
+    # The src modules load their heavy libraries lazily, so import those too,
+    # then run the stage once on a small slice (first-call caches, warnings
+    # registries): the timings exclude import and warm-up cost
+    import importlib
+    import data_loader, diagnostics, garch_model, regime_switching  # noqa: F401
+    for module in WARMUP_MODULES:
+        importlib.import_module(module)
+
+    returns = pd.read_pickle(data_path)
+    setup, run = BENCHES[stage]
+    with tempfile.TemporaryDirectory() as workdir:
+        run(*setup(returns.iloc[:WARMUP_OBS, :1], workdir))
+    with tempfile.TemporaryDirectory() as workdir:
+        args = setup(returns, workdir)
+        rss_before = peak_rss_mb()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        run(*args)
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    return {
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "peak_rss_mb": peak_rss_mb(),
+        "setup_peak_rss_mb": rss_before,
+    }
+
+def run_benchmarks(lengths, assets, stages=STAGES, max_fit_obs=DEFAULT_MAX_FIT_OBS,
+                   max_case_obs=DEFAULT_MAX_CASE_OBS, seed=0):
+    """
+    Run every (stage, length, asset count) case in its own spawned process.
+    Returns a list of result records.
+    """
+    ctx = mp.get_context("spawn")
+    records = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        for n_obs in lengths:
+            for n_assets in assets:
+                size = n_obs * n_assets
+                case_records = []
+                for stage_name in stages:
+                    record = {"stage": stage_name, "n_obs": n_obs, "n_assets": n_assets}
+                    if size > max_case_obs:
+                        record["skipped"] = f"n_obs * n_assets > max_case_obs ({max_case_obs})"
+                    elif stage_name.startswith("fit_") and size > max_fit_obs:
+                        record["skipped"] = f"n_obs * n_assets > max_fit_obs ({max_fit_obs})"
+                    case_records.append(record)
+                records += case_records
+                runnable = [r for r in case_records if "skipped" not in r]
+                if not runnable:
+                    continue
+
+                # Regime-switching data for the HMM, GARCH data for everything
+                # else; only what the remaining stages use is simulated
+                kinds = {"regime" if r["stage"] == "fit_hmm_regimes" else "garch" for r in runnable}
+                paths = {}
+                for kind in sorted(kinds):
+                    if kind == "garch":
+                        df = simulate_garch_returns(n_obs, n_assets, seed=seed)
+                    else:
+                        df = simulate_regime_returns(n_obs, n_assets, seed=seed)[0]
+                    paths[kind] = os.path.join(data_dir, f"{kind}_{n_obs}_{n_assets}.pkl")
+                    df.to_pickle(paths[kind])
+                    del df
+
+                for record in runnable:
+                    stage_name = record["stage"]
+                    kind = "regime" if stage_name == "fit_hmm_regimes" else "garch"
+                    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                        result = pool.submit(_run_case, stage_name, paths[kind]).result()
+                    record.update(result)
+                    record["throughput_obs_per_s"] = size / result["wall_s"]
+                    rss = result["peak_rss_mb"]
+                    print(
+                        f"{stage_name:22s} n_obs={n_obs:>8d} n_assets={n_assets:>5d} "
+                        f"wall={result['wall_s']:9.3f}s "
+                        f"peak_rss={'n/a' if rss is None else f'{rss:.1f}MB':>10s}",
+                        file=sys.stderr,
+                    )
+                for path in paths.values():
+                    os.remove(path)
+    return records
+
+def _environment():
+    versions = {}
+    for name in ("numpy", "pandas", "scipy", "arch", "hmmlearn", "scikit-learn"):
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": pd.Timestamp.now(tz="UTC").isoformat(),
+        "versions": versions,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic data.")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1000, 10000],
+                        help="series lengths (observations per asset), e.g. 1000 100000 1000000")
+    parser.add_argument("--assets", type=int, nargs="+", default=[1, 10],
+                        help="asset counts, e.g. 1 100 1000")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--max-fit-obs", type=int, default=DEFAULT_MAX_FIT_OBS,
+                        help="skip model fits above this many observations per case")
+    parser.add_argument("--max-case-obs", type=int, default=DEFAULT_MAX_CASE_OBS,
+                        help="skip every stage (and the data simulation) above this many observations per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON output path (default: stdout)")
+    args = parser.parse_args()
+
+    report = {
+        "environment": _environment(),
+        "results": run_benchmarks(args.lengths, args.assets, args.stages,
+                                  max_fit_obs=args.max_fit_obs, max_case_obs=args.max_case_obs,
+                                  seed=args.seed),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
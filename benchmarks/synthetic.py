@@ -0,0 +1,99 @@
+"""
+Deterministic synthetic return generators for the benchmarks (no network).
+Returns are daily log returns as fractions, like compute_log_returns produces.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Business days from 1990 run out of Timestamp range around 70k periods;
+# longer series get a minute-frequency index instead
+MAX_DAILY_OBS = 50_000
+
+def _dates(n_obs: int):
+    if n_obs <= MAX_DAILY_OBS:
+        return pd.bdate_range("1990-01-01", periods=n_obs, name="date")
+    return pd.date_range("1990-01-01", periods=n_obs, freq="min", name="date")
+
+def _columns(n_assets: int):
+    return [f"SYN{i:04d}" for i in range(n_assets)]
+
+def simulate_garch_returns(
+    n_obs: int,
+    n_assets: int = 1,
+    omega: float = 0.02,
+    alpha: float = 0.06,
+    gamma: float = 0.08,
+    beta: float = 0.88,
+    mu: float = 0.03,
+    seed: int = 0
+):
+    """
+    GJR-GARCH(1,1) returns with normal shocks (parameters in % units, as the
+    models are fitted); gamma = 0 gives a plain GARCH(1,1). All assets are
+    simulated together, one vectorized step per date.
+    """
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((n_obs, n_assets))
+    out = np.empty((n_obs, n_assets))
+    sigma2 = np.full(n_assets, omega / (1.0 - alpha - 0.5 * gamma - beta))
+    for t in range(n_obs):
+        e = np.sqrt(sigma2) * z[t]
+        out[t] = mu + e
+        sigma2 = omega + (alpha + gamma * (e < 0)) * e * e + beta * sigma2
+    return pd.DataFrame(out / 100.0, index=_dates(n_obs), columns=_columns(n_assets))
+
+def simulate_regime_returns(
+    n_obs: int,
+    n_assets: int = 1,
+    transmat=((0.98, 0.02), (0.05, 0.95)),
+    means=(0.0005, -0.001),
+    vols=(0.008, 0.025),
+    seed: int = 0
+):
+    """
+    Markov regime-switching Gaussian returns: each asset follows its own
+    hidden chain with transition matrix `transmat` and per-state mean/vol.
+    Returns the returns DataFrame and the (n_obs, n_assets) state array.
+    """
+    rng = np.random.default_rng(seed)
+    cum = np.cumsum(np.asarray(transmat, dtype="float64"), axis=1)
+    u = rng.random((n_obs, n_assets))
+    states = np.empty((n_obs, n_assets), dtype=np.int64)
+    states[0] = 0
+    for t in range(1, n_obs):
+        states[t] = (u[t][:, None] > cum[states[t - 1]]).sum(axis=1)
+    means, vols = np.asarray(means), np.asarray(vols)
+    ret = means[states] + vols[states] * rng.standard_normal((n_obs, n_assets))
+    return pd.DataFrame(ret, index=_dates(n_obs), columns=_columns(n_assets)), states
+
+def prices_from_returns(returns: pd.DataFrame, start_price: float = 100.0):
+    """Close prices whose log returns are `returns` (one extra leading date)."""
+    log_p = np.vstack([np.zeros(returns.shape[1]), np.cumsum(returns.to_numpy(), axis=0)])
+    first = returns.index[0] - (returns.index[1] - returns.index[0])
+    index = pd.DatetimeIndex([first], name="date").append(returns.index)
+    return pd.DataFrame(start_price * np.exp(log_p), index=index, columns=returns.columns)
+
+def simulate_intraday_bars(
+    start: str = "2021-03-08",
+    n_days: int = 10,
+    tz: str = "America/New_York",
+    freq: str = "1min",
+    vol: float = 0.0005,
+    overnight_vol: float = 0.005,
+    seed: int = 0
+):
+    """
+    Regular-session (09:30-16:00 local) bars of a random walk in log price,
+    with a separate overnight jump between sessions. Returns a DataFrame
+    [timestamp (tz-aware, in `tz`), close].
+    """
+    rng = np.random.default_rng(seed)
+    frames, logp = [], np.log(100.0)
+    for day in pd.bdate_range(start, periods=n_days):
+        stamps = pd.date_range(f"{day:%Y-%m-%d} 09:30", f"{day:%Y-%m-%d} 16:00", freq=freq, tz=tz)
+        logp += overnight_vol * rng.standard_normal()
+        path = logp + np.cumsum(np.r_[0.0, vol * rng.standard_normal(len(stamps) - 1)])
+        logp = path[-1]
+        frames.append(pd.DataFrame({"timestamp": stamps, "close": np.exp(path)}))
+    return pd.concat(frames, ignore_index=True)
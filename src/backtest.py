@@ -0,0 +1,97 @@
+import warnings
+import numpy as np
+import pandas as pd
+from garch_model import DEFAULT_GARCH_SPECS
+
+def walk_forward_forecasts(
+    returns: pd.Series,
+    specs=None,
+    start=None,
+    refit_every: int = 1,
+    window: int = None,
+    min_train: int = 500
+):
+    """
+    Rolling-origin (walk-forward) one-day-ahead volatility forecasts.
+
+    At each refit date t the models are re-estimated on data up to t-1, warm-started
+    from the previous refit's parameters. Between refits the parameters are held
+    fixed and the variance recursion is only filtered forward, so every forecast
+    uses information up to the previous close only. If the previous parameters
+    sit on a constraint boundary arch rejects them and that refit starts cold.
+
+    Parameters
+    ----------
+    returns : pd.Series
+        Log returns of the asset (fractions).
+    specs : list of dicts, optional
+        GARCH specs as in fit_garch_models (default: DEFAULT_GARCH_SPECS).
+    start : date-like or int, optional
+        First forecast target date (or integer position). Defaults to the
+        observation right after `min_train`.
+    refit_every : int
+        Re-estimate every k days; 1 refits daily.
+    window : int, optional
+        Rolling estimation window length in observations; None uses an
+        expanding window from the first observation.
+    min_train : int
+        Minimum number of observations in the first estimation sample.
+
+    Returns
+    -------
+    forecasts : pd.DataFrame
+        Index = forecast target date, one column per model with the one-day-ahead
+        volatility forecast (% terms), plus 'refit' flagging re-estimation dates.
+    """
+    from arch import arch_model
+    from arch.utility.exceptions import StartingValueWarning
+
+    if specs is None:
+        specs = DEFAULT_GARCH_SPECS
+    if refit_every < 1:
+        raise ValueError("refit_every must be >= 1")
+
+    r = returns.dropna() * 100.0
+    T = len(r)
+    if start is None:
+        first_target = min_train
+    elif isinstance(start, (int, np.integer)):
+        first_target = int(start)
+    else:
+        first_target = int(r.index.searchsorted(pd.Timestamp(start)))
+    if first_target < min_train or first_target >= T:
+        raise ValueError(
+            f"first forecast target must leave at least {min_train} training "
+            f"observations and lie inside the sample ({T} observations)"
+        )
+
+    refit_points = list(range(first_target, T, refit_every))
+    out = {}
+    for spec in specs:
+        model = arch_model(r, **{k: v for k, v in spec.items() if k != "name"})
+        vol = np.full(T - first_target, np.nan)
+        prev_params = None
+
+        for t in refit_points:
+            first_obs = 0 if window is None else max(0, t - window)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", StartingValueWarning)
+                res = model.fit(
+                    first_obs=first_obs, last_obs=t,
+                    starting_values=prev_params, disp="off"
+                )
+            prev_params = res.params.to_numpy()
+
+            # Forecast made at origin s targets s + 1; origins t-1 .. stop-2
+            stop = min(t + refit_every, T)
+            fcast = res.forecast(start=t - 1, horizon=1, reindex=False)
+            var_block = fcast.variance.to_numpy()[: stop - t, 0]
+            vol[t - first_target: stop - first_target] = np.sqrt(var_block)
+
+        out[spec["name"]] = vol
+
+    forecasts = pd.DataFrame(out, index=r.index[first_target:])
+    forecasts.index.name = "date"
+    forecasts["refit"] = False
+    forecasts.iloc[[p - first_target for p in refit_points], forecasts.columns.get_loc("refit")] = True
+    return forecasts
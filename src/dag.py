@@ -0,0 +1,213 @@
+import os
+import json
+import pickle
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+from fit_cache import cache_get, cache_put, project_source_digest, DEFAULT_MAX_CACHE_BYTES
+from instrumentation import span, call_traced, merge_events
+
+# Pipeline stages as a dependency graph with a persistent artifact store.
+#
+# A stage is a top-level function called as func(*input_artifacts, **params).
+# Its key hashes the function's code object, the source of every project
+# module (so edits to code it calls count too), its params and the digests of
+# its inputs; the artifact is pickled under that key, so a later run reuses it
+# as long as nothing upstream changed. Settings that only change how a stage
+# runs and not what it returns (worker counts, fit cache directories) are
+# passed as `exec_params`: they reach the function but stay out of the key,
+# so changing them alone reruns nothing. Volatile stages (e.g. reading fresh
+# data) always run, and their digest is a hash of what they produced, so
+# downstream stages recompute only when that output actually changed. A stage
+# that writes files declares them as `outputs`; the store's output manifest
+# records, for every such file, the key of the stage run that wrote it and the
+# file's size and modification time. A stored artifact is only reused if each
+# of its files is still the one its own key wrote, so files that went missing,
+# were changed by hand or were overwritten by a run with other settings are
+# written again. Every stage is traced (see instrumentation); spans recorded
+# in worker processes are merged back here.
+
+OUTPUT_MANIFEST = "outputs.json"
+
+def stage(name: str, func, inputs=(), volatile: bool = False, outputs=(), exec_params=None, **params):
+    """
+    Declare a stage: `inputs` are the names of the stages whose artifacts it
+    takes, `outputs` the paths of the files it writes. `exec_params` are
+    keyword arguments that do not affect the result (e.g. n_jobs); unlike
+    `params` they are not part of the stage key.
+    """
+    return {"name": name, "func": func, "inputs": tuple(inputs), "volatile": volatile,
+            "outputs": tuple(outputs), "params": params, "exec_params": dict(exec_params or {})}
+
+def _update_code(h, code):
+    """Feed a code object's bytecode and constants (nested functions included) to `h`."""
+    h.update(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            _update_code(h, const)
+        else:
+            h.update(repr(const).encode())
+
+def _stage_key(st: dict, input_digests):
+    h = hashlib.sha256()
+    func = st["func"]
+    h.update(f"{st['name']}|{func.__module__}.{func.__qualname__}".encode())
+    _update_code(h, func.__code__)
+    h.update(project_source_digest().encode())
+    h.update(json.dumps(st["params"], sort_keys=True, default=str).encode())
+    for digest in input_digests:
+        h.update(digest.encode())
+    return h.hexdigest()
+
+def _content_digest(obj):
+    h = hashlib.sha256()
+    if isinstance(obj, (pd.Series, pd.DataFrame)):
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+        h.update(repr(getattr(obj, "columns", obj.name)).encode())
+    else:
+        h.update(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    return h.hexdigest()
+
+def _file_stamp(path: str):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def _read_manifest(store_dir: str):
+    try:
+        with open(os.path.join(store_dir, OUTPUT_MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _write_manifest(store_dir: str, manifest: dict):
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, OUTPUT_MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def _outputs_current(manifest: dict, paths, key: str):
+    """True if every file in `paths` exists and is the one the run with `key` wrote."""
+    for path in paths:
+        entry = manifest.get(os.path.abspath(path))
+        if entry is None or entry["key"] != key or not os.path.exists(path):
+            return False
+        if _file_stamp(path) != {"size": entry["size"], "mtime_ns": entry["mtime_ns"]}:
+            return False
+    return True
+
+def _topological_order(stages: dict):
+    order, visiting, done = [], set(), set()
+
+    def visit(name, path):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"stage graph has a cycle: {' -> '.join(path + [name])}")
+        if name not in stages:
+            raise ValueError(f"unknown stage {name!r} (input of {path[-1]!r})")
+        visiting.add(name)
+        for dep in stages[name]["inputs"]:
+            visit(dep, path + [name])
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in stages:
+        visit(name, [])
+    return order
+
+def run_dag(
+    stages,
+    store_dir: str,
+    max_workers: int = None,
+    max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    refresh: bool = False
+):
+    """
+    Run a stage graph, reusing stored artifacts of unchanged stages.
+
+    Stages whose inputs are ready are dispatched as soon as possible, so
+    independent branches (e.g. GARCH and HMM of each asset) run concurrently
+    over `max_workers` processes; max_workers <= 1 runs everything in this
+    process. Artifacts must be picklable.
+
+    Parameters
+    ----------
+    stages : list of dicts from stage()
+    store_dir : str
+        Artifact store directory (size-bounded LRU, see fit_cache).
+    refresh : bool
+        Recompute every stage, ignoring (and overwriting) stored artifacts.
+
+    Returns
+    -------
+    artifacts : {stage name: artifact}
+    status : {stage name: "ran" or "cached"}
+    """
+    stages = {st["name"]: st for st in stages}
+    order = _topological_order(stages)
+    artifacts, digests, status = {}, {}, {}
+    manifest = _read_manifest(store_dir)
+    pending = list(order)
+    running = {}
+
+    def finish(name, key, traced):
+        artifact, events = traced
+        merge_events(events)
+        st = stages[name]
+        artifacts[name] = artifact
+        status[name] = "ran"
+        if st["volatile"]:
+            digests[name] = _content_digest(artifact)
+        else:
+            digests[name] = key
+            cache_put(store_dir, key, (artifact,), max_bytes=max_bytes)
+        if st["outputs"]:
+            for path in st["outputs"]:
+                if os.path.exists(path):
+                    manifest[os.path.abspath(path)] = dict(_file_stamp(path), key=key)
+            _write_manifest(store_dir, manifest)
+
+    pool = ProcessPoolExecutor(max_workers=max_workers) if max_workers and max_workers > 1 else None
+    try:
+        while pending or running:
+            # Resolve everything that is ready; cache hits can unlock more stages
+            progressed = True
+            while progressed:
+                progressed = False
+                for name in [n for n in pending if all(i in digests for i in stages[n]["inputs"])]:
+                    pending.remove(name)
+                    st = stages[name]
+                    key = _stage_key(st, [digests[i] for i in st["inputs"]])
+                    hit = None
+                    if not (st["volatile"] or refresh):
+                        with span(name, "artifact_lookup") as info:
+                            hit = cache_get(store_dir, key)
+                            if hit is not None and not _outputs_current(manifest, st["outputs"], key):
+                                # Rerun to write this configuration's files again
+                                hit = None
+                                info["stale_outputs"] = True
+                            info["hit"] = hit is not None
+                    if hit is not None:
+                        artifacts[name], digests[name], status[name] = hit[0], key, "cached"
+                        progressed = True
+                        continue
+                    args = [artifacts[i] for i in st["inputs"]]
+                    call = (st["func"], args, {**st["params"], **st["exec_params"]}, name, "stage")
+                    if pool is None:
+                        finish(name, key, call_traced(*call))
+                        progressed = True
+                    else:
+                        running[pool.submit(call_traced, *call)] = (name, key)
+
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key = running.pop(future)
+                    finish(name, key, future.result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return artifacts, status
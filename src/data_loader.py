@@ -1,16 +1,22 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from datetime import datetime
+from panel_store import save_returns_panel
+from instrumentation import span
 
-def download_asset(ticker: str, start="2015-01-01", end=None):
+# Calendar days re-fetched before the cached range on a top-up, to detect
+# re-adjusted history (splits, dividends) in auto-adjusted closes
+TOPUP_OVERLAP_DAYS = 10
+
+def yahoo_provider(ticker: str, start: str, end: str):
     """
-    Downloads historical daily price data for the given ticker from Yahoo Finance.
-    Returns a DataFrame with 'close' prices only.
+    Default price provider: daily auto-adjusted closes from Yahoo Finance.
+    Returns a DataFrame with a 'close' column indexed by date.
     """
-    if end is None:
-        end = datetime.today().strftime("%Y-%m-%d")
+    import yfinance as yf
+
     df = yf.download(
         ticker,
         start=start,
@@ -19,10 +25,122 @@ def download_asset(ticker: str, start="2015-01-01", end=None):
         auto_adjust=True,
         progress=False
     )
-    df = df[["Close"]].rename(columns={"Close": "close"})
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    return df[["Close"]].rename(columns={"Close": "close"})
+
+def csv_provider(data_dir: str):
+    """
+    Build a provider that serves prices from local '<ticker>.csv' fixture files
+    (columns: date, close). Useful for tests and offline runs.
+    """
+    def provider(ticker: str, start: str, end: str):
+        df = pd.read_csv(
+            os.path.join(data_dir, f"{ticker}.csv"), index_col=0, parse_dates=True
+        )
+        mask = (df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))
+        return df.loc[mask, ["close"]]
+    return provider
+
+def _cache_path(cache_dir: str, ticker: str):
+    safe = ticker.replace(os.sep, "_")
+    return os.path.join(cache_dir, f"{safe}.parquet")
+
+def read_price_cache(cache_dir: str, ticker: str):
+    """
+    Read the cached price partition for a ticker.
+    Returns (prices, covered_start, covered_end) or None if nothing is cached.
+    The coverage bounds are the [start, end) range that has been requested so far,
+    which can be wider than the first/last stored trading day.
+    """
+    import pyarrow.parquet as pq
+
+    path = _cache_path(cache_dir, ticker)
+    if not os.path.exists(path):
+        return None
+    table = pq.read_table(path)
+    meta = table.schema.metadata or {}
+    df = table.to_pandas()
+    covered_start = pd.Timestamp(meta[b"covered_start"].decode())
+    covered_end = pd.Timestamp(meta[b"covered_end"].decode())
+    return df, covered_start, covered_end
+
+def write_price_cache(cache_dir: str, ticker: str, prices: pd.DataFrame,
+                      covered_start, covered_end):
+    """
+    Write a ticker's price partition together with its [start, end) coverage.
+    The file is replaced atomically so a crashed run never leaves a torn partition.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(cache_dir, exist_ok=True)
+    table = pa.Table.from_pandas(prices, preserve_index=True)
+    meta = dict(table.schema.metadata or {})
+    meta[b"covered_start"] = pd.Timestamp(covered_start).strftime("%Y-%m-%d").encode()
+    meta[b"covered_end"] = pd.Timestamp(covered_end).strftime("%Y-%m-%d").encode()
+    path = _cache_path(cache_dir, ticker)
+    tmp_path = path + ".tmp"
+    pq.write_table(table.replace_schema_metadata(meta), tmp_path)
+    os.replace(tmp_path, path)
+
+def _normalize_prices(df: pd.DataFrame):
+    df = df[["close"]].astype("float64")
     df.index = pd.to_datetime(df.index)
-    df.sort_index(inplace=True)
-    return df
+    df.index.name = "date"
+    df = df[~df.index.duplicated(keep="last")]
+    return df.sort_index()
+
+def download_asset(ticker: str, start="2015-01-01", end=None,
+                   cache_dir: str = None, provider=None):
+    """
+    Downloads historical daily price data for the given ticker.
+    Returns a DataFrame with 'close' prices only.
+
+    provider : callable(ticker, start, end) -> DataFrame with a 'close' column.
+        Defaults to Yahoo Finance; swap in csv_provider(...) for offline fixtures.
+    cache_dir : str, optional
+        Folder holding one Parquet partition per ticker. When given, the cache is
+        consulted first and only the missing tail after the covered range is
+        fetched from the provider, starting TOPUP_OVERLAP_DAYS early. Adjusted
+        closes are rescaled back in time after a split or dividend, so if the
+        overlapping closes differ from the cached ones the whole history of
+        the ticker is fetched again.
+    """
+    if end is None:
+        end = datetime.today().strftime("%Y-%m-%d")
+    if provider is None:
+        provider = yahoo_provider
+    start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end)
+
+    if cache_dir is None:
+        with span(ticker, "download", fetch="full"):
+            return _normalize_prices(provider(ticker, start, end))
+
+    cached = read_price_cache(cache_dir, ticker)
+    if cached is None or start_ts < cached[1]:
+        # Nothing usable cached (or the request reaches further back): full fetch
+        with span(ticker, "download", fetch="full"):
+            df = _normalize_prices(provider(ticker, start, end))
+        write_price_cache(cache_dir, ticker, df, start_ts, end_ts)
+    else:
+        df, covered_start, covered_end = cached
+        if end_ts > covered_end:
+            # Incremental top-up: fetch the tail after the covered range plus
+            # a short overlap to check the cached closes against
+            overlap_start = covered_end - pd.Timedelta(days=TOPUP_OVERLAP_DAYS)
+            with span(ticker, "download", fetch="tail"):
+                tail = _normalize_prices(provider(ticker, overlap_start.strftime("%Y-%m-%d"), end))
+            common = tail.index.intersection(df.index)
+            if not np.allclose(tail.loc[common, "close"], df.loc[common, "close"], rtol=1e-6, atol=0.0):
+                # History was re-adjusted since it was cached: full refetch
+                with span(ticker, "download", fetch="full", reason="readjusted"):
+                    df = _normalize_prices(provider(ticker, covered_start.strftime("%Y-%m-%d"), end))
+            elif len(tail):
+                df = _normalize_prices(pd.concat([df, tail]))
+            write_price_cache(cache_dir, ticker, df, covered_start, end_ts)
+
+    return df.loc[(df.index >= start_ts) & (df.index < end_ts)]
 
 def compute_log_returns(price_df: pd.DataFrame):
     """
@@ -31,28 +149,156 @@ def compute_log_returns(price_df: pd.DataFrame):
     ret = np.log(price_df["close"]).diff().dropna()
     return ret.to_frame(name="log_ret")
 
-def load_data(output_dir: str = "../data"):
+def compute_log_returns_chunked(
+    price_path: str,
+    out_path: str,
+    chunk_rows: int = 1_000_000,
+    time_col: str = "timestamp",
+    price_col: str = "close",
+    tz=None
+):
+    """
+    Streaming compute_log_returns for price histories too long to load at once
+    (e.g. years of minute bars): prices are read `chunk_rows` at a time from a
+    Parquet or CSV file (see intraday.iter_bar_chunks) and each chunk's log
+    returns are appended to a Parquet file, so memory stays bounded by the
+    chunk size. The last log price of a chunk is carried into the next one,
+    so the output equals compute_log_returns on the whole series.
+
+    Returns
+    -------
+    (out_path, n_returns) ; the file has columns [date, log_ret] and is
+    replaced atomically. Time-zone-aware timestamps keep their time zone in
+    the file's schema (`tz` if given, else the zone of the first chunk; CSV
+    values with UTC offsets are read as UTC); naive ones stay naive.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from itertools import chain
+    from intraday import iter_bar_chunks
+
+    chunks = iter_bar_chunks(price_path, chunk_rows, time_col, price_col, tz)
+    first = next(chunks, None)
+    tz = None if first is None else first[0].tz
+    # Arrow stores tz-aware timestamps as UTC instants plus the zone name
+    date_type = pa.timestamp("ns", tz=None if tz is None else pa.array(first[0][:1]).type.tz)
+    schema = pa.schema([("date", date_type), ("log_ret", pa.float64())])
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    last_logp = np.nan
+    n_returns = 0
+    with span(os.path.basename(price_path), "log_returns", chunk_rows=chunk_rows) as info:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for timestamps, prices in chain([first] if first is not None else [], chunks):
+                if (timestamps.tz is None) != (tz is None):
+                    raise ValueError(f"{price_path} mixes naive and time-zone-aware timestamps")
+                logp = np.log(prices)
+                ret = np.diff(logp, prepend=last_logp)
+                last_logp = logp[-1]
+                keep = ~np.isnan(ret)
+                # UTC instants of tz-aware timestamps
+                dates = timestamps.tz_convert(None) if timestamps.tz is not None else timestamps
+                writer.write_table(pa.table(
+                    {"date": dates.to_numpy().astype("datetime64[ns]")[keep], "log_ret": ret[keep]},
+                    schema=schema
+                ))
+                n_returns += int(keep.sum())
+        info["returns"] = n_returns
+    os.replace(tmp_path, out_path)
+    return out_path, n_returns
+
+def compute_panel_log_returns(price_matrix: pd.DataFrame):
+    """
+    Computes log returns for every column of a wide (date x ticker) price matrix
+    in one vectorized pass. Each ticker's return is taken against its own previous
+    observed price, so gaps from other tickers' calendars do not create NaNs.
+    """
+    log_p = np.log(price_matrix.to_numpy(dtype="float64"))
+    observed = ~np.isnan(log_p)
+    filled = pd.DataFrame(log_p).ffill().to_numpy()
+    ret = np.full_like(log_p, np.nan)
+    ret[1:] = filled[1:] - filled[:-1]
+    # Keep a return only where today's price and an earlier price both exist
+    ret[~observed] = np.nan
+    ret[1:][np.isnan(filled[:-1])] = np.nan
+    return pd.DataFrame(ret[1:], index=price_matrix.index[1:], columns=price_matrix.columns)
+
+def load_universe(
+    tickers,
+    start="2015-01-01",
+    end=None,
+    how: str = "inner",
+    max_workers: int = 8,
+    cache_dir: str = None,
+    provider=None
+):
+    """
+    Download many tickers through a bounded thread pool and return one aligned
+    panel of log returns (date x ticker).
+
+    Parameters
+    ----------
+    tickers : list of str
+        Symbols to load; column order of the result follows this list.
+    how : {"inner", "outer"}
+        "inner" keeps only dates where every ticker has a return (same as the
+        pairwise join in load_data); "outer" keeps all dates with NaN gaps.
+    max_workers : int
+        Upper bound on concurrent provider requests.
+    cache_dir, provider :
+        Passed through to download_asset.
+
+    Returns
+    -------
+    returns : pd.DataFrame
+        Log returns, one column per ticker.
+    """
+    tickers = list(tickers)
+
+    def _fetch(ticker):
+        return download_asset(ticker, start=start, end=end,
+                              cache_dir=cache_dir, provider=provider)["close"]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as pool:
+        closes = list(pool.map(_fetch, tickers))
+
+    # One concat builds the wide price matrix; no per-ticker join chain
+    prices = pd.concat(closes, axis=1, keys=tickers, join="outer").sort_index()
+    returns = compute_panel_log_returns(prices)
+
+    if how == "inner":
+        returns = returns.dropna(how="any")
+    elif how == "outer":
+        returns = returns.dropna(how="all")
+    else:
+        raise ValueError(f"how must be 'inner' or 'outer', got {how!r}")
+    returns.index.name = "date"
+    return returns
+
+def load_data(output_dir: str = "../data", cache_dir: str = None, provider=None):
     """
     Downloads SPY and BTC-USD data, computes log returns,
-    aligns them by date, and saves as CSV files.
+    aligns them by date, and saves as CSV files plus a memory-mappable
+    panel store in '<output_dir>/returns_panel' (see panel_store).
+    Prices are served from 'cache_dir' when given (see download_asset).
     Returns:
         spy_ret, btc_ret, both
     """
     os.makedirs(output_dir, exist_ok=True)
 
-    spy_raw = download_asset("SPY")
-    btc_raw = download_asset("BTC-USD")
+    panel = load_universe(["SPY", "BTC-USD"], how="outer",
+                          cache_dir=cache_dir, provider=provider)
 
-    spy_ret = compute_log_returns(spy_raw)
-    btc_ret = compute_log_returns(btc_raw)
+    spy_ret = panel["SPY"].dropna().to_frame(name="log_ret")
+    btc_ret = panel["BTC-USD"].dropna().to_frame(name="log_ret")
 
-    both = (
-        spy_ret.rename(columns={"log_ret": "spy_ret"})
-        .join(btc_ret.rename(columns={"log_ret": "btc_ret"}), how="inner")
+    both = panel.dropna(how="any").rename(
+        columns={"SPY": "spy_ret", "BTC-USD": "btc_ret"}
     )
 
     spy_ret.to_csv(os.path.join(output_dir, "spx.csv"), index_label="date")
     btc_ret.to_csv(os.path.join(output_dir, "btc.csv"), index_label="date")
     both.to_csv(os.path.join(output_dir, "aligned_returns.csv"), index_label="date")
+    save_returns_panel(panel, os.path.join(output_dir, "returns_panel"))
 
     return spy_ret, btc_ret, both
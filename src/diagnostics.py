@@ -1,81 +1,302 @@
 import os
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from instrumentation import span
 
-def realized_volatility(returns: pd.Series, window: int = 5):
+HAR_WINDOWS = (5, 10, 22, 66, 252)
+RV_WINDOW = 5  # days in the realized volatility target of the pipeline
+
+def realized_volatility_panel(
+    returns,
+    windows=HAR_WINDOWS,
+    dtype="float64",
+    tidy: bool = False
+):
+    """
+    Rolling realized volatility for several windows and assets in one pass.
+
+    Squared returns are accumulated once into a cumulative sum (in float64);
+    every window is then a difference of two shifted slices, so the cost is
+    O(T * N) per window regardless of its length. As with a pandas rolling sum,
+    a window containing a missing return gives NaN, as do the first window-1
+    dates.
+
+    Parameters
+    ----------
+    returns : pd.Series, pd.DataFrame or array (T,) / (T, N)
+        Log returns (fractions), dates along the first axis.
+    windows : sequence of int
+        Window lengths in observations (default: 5, 10, 22, 66, 252).
+    dtype : str or numpy dtype
+        Output dtype, e.g. "float32" to halve the memory of large panels.
+    tidy : bool
+        Return a long DataFrame [date, asset, window, realized_vol] (NaN rows
+        dropped) instead of the array.
+
+    Returns
+    -------
+    array of shape (T, N, W) -- a Series or 1-D input gives N = 1 -- or the tidy frame.
+    """
+    values = np.asarray(returns, dtype="float64")
+    if values.ndim == 1:
+        values = values[:, None]
+    T, N = values.shape
+
+    missing = np.isnan(values)
+    # Leading zero row: the sum over (t-w, t] is csum[t+1] - csum[t+1-w]
+    csum = np.zeros((T + 1, N))
+    np.cumsum(np.where(missing, 0.0, values * values), axis=0, out=csum[1:])
+    cmiss = np.zeros((T + 1, N), dtype=np.int64)
+    np.cumsum(missing, axis=0, out=cmiss[1:])
+
+    out = np.full((T, N, len(windows)), np.nan, dtype=dtype)
+    for i, w in enumerate(windows):
+        if w > T:
+            continue
+        window_sum = csum[w:] - csum[:-w]
+        complete = cmiss[w:] == cmiss[:-w]
+        # Clip tiny negative sums left by cancellation in the differences
+        out[w - 1:, :, i] = np.where(complete, np.sqrt(np.maximum(window_sum, 0.0)), np.nan)
+
+    if not tidy:
+        return out
+
+    index = returns.index if hasattr(returns, "index") else pd.RangeIndex(T)
+    if isinstance(returns, pd.DataFrame):
+        assets = returns.columns
+    else:
+        assets = [getattr(returns, "name", None)] * N if N == 1 else range(N)
+    W = len(windows)
+    frame = pd.DataFrame({
+        "date": np.repeat(np.asarray(index), N * W),
+        "asset": np.tile(np.repeat(np.asarray(assets, dtype=object), W), T),
+        "window": np.tile(np.asarray(windows), T * N),
+        "realized_vol": out.ravel(),
+    })
+    return frame.dropna(subset=["realized_vol"]).reset_index(drop=True)
+
+def realized_volatility(returns: pd.Series, window: int = RV_WINDOW):
     """
     Compute rolling realized volatility over a given window.
     Formula: sqrt(sum of squared returns over 'window' days).
     """
-    rv = (returns ** 2).rolling(window).sum() ** 0.5
-    return rv
+    rv = realized_volatility_panel(returns, windows=(window,))[:, 0, 0]
+    return pd.Series(rv, index=returns.index, name=returns.name)
 
 def evaluate_forecasts(
-    forecasts_df_list,
+    forecasts: pd.DataFrame,
     realized_vol_series,
     asset_name: str,
+    realized_window: int = 1,
     results_dir: str = "../results",
-    figs_dir: str = "../results/figures"
+    figs_dir: str = "../results/figures",
+    make_figures: bool = True
 ):
     """
-    Compare model volatility forecasts with realized volatility.
+    Compare per-date model volatility forecasts with realized volatility.
 
     Parameters
     ----------
-    forecasts_df_list : list of DataFrames
-        Each contains columns [asset, model, last_date, one_day_ahead_vol_forecast_pct].
+    forecasts : pd.DataFrame
+        Daily volatility forecasts (% terms) indexed by target date, one column
+        per model, e.g. the GARCH conditional volatilities of fit_garch_models
+        or walk_forward_forecasts(...).drop(columns="refit").
     realized_vol_series : pd.Series
-        Rolling realized volatility (as fraction, not %).
+        Realized volatility (as fraction, not %) indexed by date.
     asset_name : str
         Asset label for plots and output filenames.
+    realized_window : int
+        Daily returns behind each realized value (5 for realized_volatility's
+        default window, 1 for intraday measures). Forecasts are aggregated to
+        the same window, sqrt of the summed daily variances, before scoring.
     results_dir : str
         Folder to save CSV outputs.
     figs_dir : str
         Folder to save figure outputs.
+    make_figures : bool
+        Draw the RMSE bar plot; False skips it without importing pyplot.
 
     Returns
     -------
     summary : pd.DataFrame
-        Table of mean absolute error and RMSE by model.
+        One row per model: [model, n, abs_err, rmse, qlike, mz_alpha, mz_beta,
+        mz_r2, mz_pvalue] (see evaluate_forecast_series; abs_err is the MAE).
+    losses : dict of DataFrames
+        Per-date 'se', 'ae' and 'qlike' losses with model columns (see
+        forecast_losses), ready for forecast_tests.compare_forecasts.
     """
     os.makedirs(results_dir, exist_ok=True)
-    os.makedirs(figs_dir, exist_ok=True)
 
-    # Merge all forecast records into one table
-    df_all = pd.concat(forecasts_df_list, ignore_index=True)
-
-    # Take the most recent realized volatility value (converted to %)
-    tail_rv = realized_vol_series.dropna().iloc[-1] * 100.0
-    df_all["realized_vol_tail_pct"] = float(tail_rv)
-
-    # Compute forecast errors
-    df_all["abs_err"] = np.abs(
-        df_all["one_day_ahead_vol_forecast_pct"] - df_all["realized_vol_tail_pct"]
-    )
-    df_all["sq_err"] = (
-        df_all["one_day_ahead_vol_forecast_pct"] - df_all["realized_vol_tail_pct"]
-    ) ** 2
+    forecasts = forecasts.astype("float64")
+    if realized_window > 1:
+        forecasts = np.sqrt((forecasts ** 2).rolling(realized_window).sum())
+    rv = realized_vol_series.rename(asset_name)
 
-    # Aggregate metrics
+    # Full-sample metrics and date-aligned losses
     summary = (
-        df_all.groupby("model")
-        .agg({"abs_err": "mean", "sq_err": "mean"})
+        evaluate_forecast_series(forecasts, rv)
+        .droplevel("asset")
+        .reset_index()
+        .rename(columns={"mae": "abs_err"})
+        [["model", "n", "abs_err", "rmse", "qlike", "mz_alpha", "mz_beta", "mz_r2", "mz_pvalue"]]
     )
-    summary["rmse"] = np.sqrt(summary["sq_err"])
-    summary = summary.drop(columns=["sq_err"]).reset_index()
+    losses = {
+        name: frame.droplevel(0, axis=1)
+        for name, frame in forecast_losses(forecasts, rv).items()
+    }
 
     # 📊 RMSE bar plot
-    plt.figure()
-    plt.bar(summary["model"], summary["rmse"], color="skyblue")
-    plt.title(f"{asset_name}: Forecast RMSE vs Realized Volatility")
-    plt.ylabel("RMSE (pct vol)")
-    plt.tight_layout()
-    plt.savefig(os.path.join(figs_dir, f"{asset_name}_forecast_rmse.png"))
-    plt.close()
+    if make_figures:
+        from visualization import plot_forecast_rmse
+        with span(f"{asset_name} RMSE figure", "plot"):
+            plot_forecast_rmse(asset_name, summary, figs_dir)
 
     # Save results as CSV
     out_csv = os.path.join(results_dir, f"{asset_name}_forecast_eval.csv")
     summary.to_csv(out_csv, index=False)
+    long_losses = pd.concat(
+        {name: frame.stack() for name, frame in losses.items()}, axis=1
+    ).dropna(how="all")
+    long_losses.index.names = ["date", "model"]
+    long_losses.to_csv(os.path.join(results_dir, f"{asset_name}_forecast_losses.csv"))
 
-    return summary
+    return summary, losses
+
+def _align_realized(forecasts: pd.DataFrame, realized_vol):
+    """
+    Forecast matrix F (T, C) in % vol, realized vol matrix RV (T, A) in % on
+    the same dates, and for each forecast column the position of its asset in
+    RV. Columns are returned as an (asset, model) MultiIndex.
+    """
+    if not isinstance(forecasts.columns, pd.MultiIndex):
+        if isinstance(realized_vol, pd.DataFrame):
+            raise ValueError("single-level forecast columns need a realized vol Series")
+        asset = realized_vol.name if realized_vol.name is not None else "asset"
+        forecasts = pd.concat({asset: forecasts}, axis=1)
+    if isinstance(realized_vol, pd.Series):
+        realized_vol = realized_vol.to_frame(
+            name=forecasts.columns.get_level_values(0)[0]
+        )
+
+    assets = forecasts.columns.get_level_values(0)
+    missing = set(assets) - set(realized_vol.columns)
+    if missing:
+        raise ValueError(f"no realized volatility for assets: {sorted(missing)}")
+    rv = realized_vol.reindex(forecasts.index)
+    F = forecasts.to_numpy(dtype="float64")
+    RV = rv.to_numpy(dtype="float64") * 100.0
+    return forecasts.columns, F, RV, rv.columns.get_indexer(assets)
+
+def forecast_losses(forecasts: pd.DataFrame, realized_vol):
+    """
+    Per-date forecast losses, aligned by date.
+
+    Parameters
+    ----------
+    forecasts : pd.DataFrame
+        Volatility forecasts (% terms) indexed by target date, with
+        (asset, model) MultiIndex columns -- or plain model columns for a
+        single asset, e.g. walk_forward_forecasts(...).drop(columns="refit").
+    realized_vol : pd.DataFrame or pd.Series
+        Realized volatility (fraction) indexed by date, one column per asset.
+
+    Returns
+    -------
+    dict of DataFrames shaped like `forecasts` (NaN where either side is missing):
+        'se' : squared error of the volatility forecast
+        'ae' : absolute error of the volatility forecast
+        'qlike' : QLIKE loss on variances, log(h) + rv^2 / h
+    """
+    columns, F, RV, asset_pos = _align_realized(forecasts, realized_vol)
+    R = RV[:, asset_pos]
+    valid = np.isfinite(F) & np.isfinite(R) & (F > 0)
+    err = np.where(valid, F - R, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = np.where(valid, F * F, np.nan)
+        qlike = np.log(h) + R * R / h
+    return {
+        name: pd.DataFrame(values, index=forecasts.index, columns=columns)
+        for name, values in (("se", err * err), ("ae", np.abs(err)), ("qlike", qlike))
+    }
+
+def evaluate_forecast_series(forecasts: pd.DataFrame, realized_vol, block: int = 256):
+    """
+    Full-sample evaluation of forecast series against realized volatility.
+
+    Every (asset, model) series is scored at once from column-wise masked sums,
+    so thousands of series cost a few array passes and no groupby. The sums are
+    accumulated over blocks of `block` dates, which keeps the temporaries small
+    no matter how long or wide the panel is. Dates where either the forecast
+    or the realized value is missing are skipped per series.
+
+    Mincer-Zarnowitz regression per series: rv_t = alpha + beta * f_t + e_t
+    (% vol), with the F-test of alpha = 0, beta = 1 under homoskedastic errors.
+
+    Parameters
+    ----------
+    forecasts, realized_vol : as in forecast_losses.
+
+    Returns
+    -------
+    pd.DataFrame indexed by (asset, model) with columns
+        [n, mse, rmse, mae, qlike, mz_alpha, mz_beta, mz_r2, mz_f, mz_pvalue]
+    """
+    from scipy import stats
+
+    columns, F, RV, asset_pos = _align_realized(forecasts, realized_vol)
+    C = F.shape[1]
+    # n, sum |e|, sum e^2, sum qlike, sx, sy, sxx, syy, sxy
+    acc = np.zeros((9, C))
+    for start in range(0, F.shape[0], block):
+        x = F[start:start + block]
+        y = RV[start:start + block][:, asset_pos]
+        valid = np.isfinite(x) & np.isfinite(y) & (x > 0)
+        # Skipped entries become x = 1, y = 0 (zero QLIKE), then x = 0
+        x = np.where(valid, x, 1.0)
+        y = np.where(valid, y, 0.0)
+        h = x * x
+        acc[3] += (np.log(h) + y * y / h).sum(axis=0)
+        x[~valid] = 0.0
+        err = x - y
+        acc[0] += valid.sum(axis=0)
+        acc[1] += np.abs(err).sum(axis=0)
+        acc[2] += (err * err).sum(axis=0)
+        acc[4] += x.sum(axis=0)
+        acc[5] += y.sum(axis=0)
+        acc[6] += (x * x).sum(axis=0)
+        acc[7] += (y * y).sum(axis=0)
+        acc[8] += (x * y).sum(axis=0)
+    n, sae, sse, sql, sx, sy, sxx, syy, sxy = acc
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mse, mae, qlike = sse / n, sae / n, sql / n
+
+        # OLS of y on [1, x] from the sufficient statistics
+        det = n * sxx - sx * sx
+        beta = (n * sxy - sx * sy) / det
+        alpha = (sy - beta * sx) / n
+        ssr = np.maximum(syy - alpha * sy - beta * sxy, 0.0)
+        sst = syy - sy * sy / n
+        r2 = 1.0 - ssr / sst
+
+        # Wald / F statistic for (alpha, beta) = (0, 1): d' X'X d / (2 s^2)
+        da, db = alpha, beta - 1.0
+        quad = n * da * da + 2.0 * sx * da * db + sxx * db * db
+        f_stat = quad / 2.0 / (ssr / (n - 2.0))
+        p_value = stats.f.sf(f_stat, 2, n - 2.0)
+
+    return pd.DataFrame(
+        {
+            "n": n.astype(int),
+            "mse": mse,
+            "rmse": np.sqrt(mse),
+            "mae": mae,
+            "qlike": qlike,
+            "mz_alpha": alpha,
+            "mz_beta": beta,
+            "mz_r2": r2,
+            "mz_f": f_stat,
+            "mz_pvalue": p_value,
+        },
+        index=columns.set_names(["asset", "model"]),
+    )
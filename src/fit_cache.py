@@ -0,0 +1,112 @@
+import os
+import json
+import pickle
+import hashlib
+from functools import lru_cache
+from importlib import metadata
+import pandas as pd
+
+# Size bound of a fit cache directory; least recently used entries go first
+DEFAULT_MAX_CACHE_BYTES = 512 * 1024 ** 2
+
+# Libraries whose versions can change fitted results
+FIT_LIBRARIES = ("numpy", "pandas", "scipy", "arch", "hmmlearn", "scikit-learn")
+
+def _library_versions():
+    versions = {}
+    for name in FIT_LIBRARIES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+@lru_cache(maxsize=None)
+def project_source_digest():
+    """
+    SHA-256 over the source of every project module (the .py files next to
+    this one), computed once per process. Keys that include it change with
+    any code edit, including edits to functions a stage or fit only calls.
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(src_dir)):
+        if name.endswith(".py"):
+            h.update(name.encode())
+            with open(os.path.join(src_dir, name), "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def fit_cache_key(returns: pd.Series, spec: dict, kind: str):
+    """
+    Content address of a fit: SHA-256 over the return values and dates, the
+    model specification (any JSON-able dict), the kind of fit, the versions
+    of the fitting libraries and the project source (the native HMM engine
+    fits in project code). Any change in data, spec, library version or code
+    gives a new key, so stale entries are never returned, only evicted.
+    """
+    h = hashlib.sha256()
+    h.update(kind.encode())
+    h.update(pd.util.hash_pandas_object(returns, index=True).to_numpy().tobytes())
+    h.update(json.dumps(spec, sort_keys=True, default=str).encode())
+    h.update(json.dumps(_library_versions(), sort_keys=True).encode())
+    h.update(project_source_digest().encode())
+    return h.hexdigest()
+
+def _entry_path(cache_dir: str, key: str):
+    return os.path.join(cache_dir, f"{key}.pkl")
+
+def cache_get(cache_dir: str, key: str):
+    """
+    Return the cached object for `key`, or None on a miss. A hit refreshes the
+    entry's modification time, which is its recency for LRU eviction.
+    """
+    path = _entry_path(cache_dir, key)
+    try:
+        with open(path, "rb") as f:
+            obj = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+    os.utime(path)
+    return obj
+
+def cache_put(cache_dir: str, key: str, obj, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+    """
+    Store `obj` under `key` and evict least recently used entries beyond
+    `max_bytes`. The entry is written atomically, so concurrent workers never
+    read a torn file.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(cache_dir, key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    evict_cache(cache_dir, max_bytes)
+
+def evict_cache(cache_dir: str, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+    """
+    Delete the least recently used entries until the cache fits in `max_bytes`.
+    Returns the number of entries removed.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".pkl"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass  # already evicted by another process
+        total -= size
+    return removed
@@ -0,0 +1,228 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Bootstrap indices shared by every asset handled in a worker process
+_BOOT_INDICES = None
+
+def stationary_bootstrap_indices(
+    n_obs: int,
+    n_boot: int = 10000,
+    mean_block: float = None,
+    random_state=42,
+    chunk: int = 1000
+):
+    """
+    Politis-Romano stationary bootstrap: resampling indices into a series of
+    length n_obs, one row per replicate.
+
+    Blocks start at uniform positions, have geometric lengths with mean
+    `mean_block` (default n_obs ** (1/3)) and wrap around the end of the sample.
+    Replicates are generated vectorized, `chunk` rows at a time to bound the
+    temporaries.
+
+    Returns
+    -------
+    int32 array of shape (n_boot, n_obs)
+    """
+    if mean_block is None:
+        mean_block = max(1.0, n_obs ** (1.0 / 3.0))
+    rng = np.random.default_rng(random_state)
+    t = np.arange(n_obs)
+    out = np.empty((n_boot, n_obs), dtype=np.int32)
+
+    for start in range(0, n_boot, chunk):
+        rows = min(chunk, n_boot - start)
+        new_block = rng.random((rows, n_obs)) < 1.0 / mean_block
+        new_block[:, 0] = True
+        starts = rng.integers(0, n_obs, size=(rows, n_obs))
+        # Position of the most recent block start, and the offset into that block
+        block_pos = np.maximum.accumulate(np.where(new_block, t, 0), axis=1)
+        first = np.take_along_axis(starts, block_pos, axis=1)
+        out[start:start + rows] = (first + (t - block_pos)) % n_obs
+    return out
+
+def _bootstrap_means(losses, indices, chunk: int = 500):
+    """
+    Mean of every loss column under each bootstrap replicate: (B, M).
+    Each replicate is turned into draw counts per date, so a chunk of
+    replicates is one (chunk, T) x (T, M) matrix product.
+    """
+    n_boot, n_obs = indices.shape
+    out = np.empty((n_boot, losses.shape[1]))
+    for start in range(0, n_boot, chunk):
+        idx = indices[start:start + chunk]
+        offsets = np.arange(len(idx))[:, None] * n_obs
+        counts = np.bincount((idx + offsets).ravel(), minlength=len(idx) * n_obs)
+        out[start:start + chunk] = counts.reshape(len(idx), n_obs) @ losses / n_obs
+    return out
+
+def _newey_west_variance(d, lag: int):
+    """Bartlett-kernel long-run variance of each column of d (T, P)."""
+    d = d - d.mean(axis=0)
+    n_obs = d.shape[0]
+    lrv = (d * d).sum(axis=0) / n_obs
+    for k in range(1, lag + 1):
+        gamma = (d[k:] * d[:-k]).sum(axis=0) / n_obs
+        lrv += 2.0 * (1.0 - k / (lag + 1.0)) * gamma
+    return lrv
+
+def diebold_mariano(losses: pd.DataFrame, lag: int = None):
+    """
+    Diebold-Mariano tests of equal expected loss for every pair of models.
+
+    Parameters
+    ----------
+    losses : pd.DataFrame
+        Per-date losses of one asset, one column per model, no missing values.
+    lag : int, optional
+        Newey-West truncation lag (default floor(T ** (1/3))).
+
+    Returns
+    -------
+    pd.DataFrame indexed by (model_1, model_2) with columns
+        [mean_diff, dm_stat, p_value]; a negative statistic favours model_1.
+    """
+    from scipy import stats
+
+    L = losses.to_numpy(dtype="float64")
+    n_obs, n_models = L.shape
+    if lag is None:
+        lag = int(n_obs ** (1.0 / 3.0))
+    i, j = np.triu_indices(n_models, k=1)
+    d = L[:, i] - L[:, j]
+    mean_diff = d.mean(axis=0)
+    lrv = _newey_west_variance(d, lag)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dm_stat = np.where(lrv > 0, mean_diff / np.sqrt(lrv / n_obs), np.nan)
+    names = losses.columns
+    return pd.DataFrame(
+        {
+            "mean_diff": mean_diff,
+            "dm_stat": dm_stat,
+            "p_value": 2.0 * stats.norm.sf(np.abs(dm_stat)),
+        },
+        index=pd.MultiIndex.from_arrays([names[i], names[j]], names=["model_1", "model_2"]),
+    )
+
+def model_confidence_set(losses: pd.DataFrame, indices, alpha: float = 0.10):
+    """
+    Hansen, Lunde and Nason (2011) Model Confidence Set with the T_max statistic.
+
+    All models are resampled with the same bootstrap indices; the bootstrap
+    means of the model losses are computed once and every elimination round
+    only recombines them, since the relative losses are linear in them.
+
+    Parameters
+    ----------
+    losses : pd.DataFrame
+        Per-date losses of one asset, one column per model, no missing values.
+    indices : array (B, T)
+        Bootstrap indices, e.g. from stationary_bootstrap_indices.
+    alpha : float
+        Size of the set: models with MCS p-value >= alpha are kept.
+
+    Returns
+    -------
+    pd.DataFrame indexed by model with columns
+        [mean_loss, mcs_pvalue, eliminated (1 = first out), in_mcs]
+    """
+    L = losses.to_numpy(dtype="float64")
+    n_models = L.shape[1]
+    mean_loss = L.mean(axis=0)
+    boot = _bootstrap_means(L, indices)
+
+    pvalues = np.ones(n_models)
+    eliminated = np.full(n_models, n_models)
+    alive = list(range(n_models))
+    running_p = 0.0
+    for rank in range(1, n_models):
+        d = mean_loss[alive] - mean_loss[alive].mean()
+        zb = boot[:, alive] - boot[:, alive].mean(axis=1, keepdims=True) - d
+        se = np.sqrt((zb * zb).mean(axis=0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_stat = np.where(se > 0, d / se, 0.0)
+            t_boot = np.where(se > 0, zb / se, 0.0).max(axis=1)
+        running_p = max(running_p, float((t_boot >= t_stat.max()).mean()))
+        worst = alive[int(np.argmax(t_stat))]
+        pvalues[worst] = running_p
+        eliminated[worst] = rank
+        alive.remove(worst)
+
+    return pd.DataFrame(
+        {
+            "mean_loss": mean_loss,
+            "mcs_pvalue": pvalues,
+            "eliminated": eliminated,
+            "in_mcs": pvalues >= alpha,
+        },
+        index=losses.columns.rename("model"),
+    )
+
+def _init_worker(indices):
+    global _BOOT_INDICES
+    _BOOT_INDICES = indices
+
+def _test_asset(losses: pd.DataFrame, alpha: float, lag, indices=None):
+    # Pool workers read the indices installed by _init_worker
+    indices = (_BOOT_INDICES if indices is None else indices)[len(losses)]
+    return diebold_mariano(losses, lag=lag), model_confidence_set(losses, indices, alpha=alpha)
+
+def compare_forecasts(
+    losses: pd.DataFrame,
+    n_boot: int = 10000,
+    mean_block: float = None,
+    alpha: float = 0.10,
+    lag: int = None,
+    random_state=42,
+    n_jobs: int = 1
+):
+    """
+    Diebold-Mariano tests and Model Confidence Sets for every asset.
+
+    Bootstrap indices are generated once per sample length (in a common panel
+    every asset has the same one) and shared by all models and assets; with
+    `n_jobs` > 1 the assets are spread over a process pool whose workers get
+    the indices once, at start-up.
+
+    Parameters
+    ----------
+    losses : pd.DataFrame
+        Per-date losses indexed by date with (asset, model) MultiIndex columns,
+        e.g. forecast_losses(forecasts, realized_vol)["qlike"]; plain model
+        columns are treated as a single asset. Dates where any model of an
+        asset is missing are dropped for that asset.
+    n_boot, mean_block, random_state : stationary bootstrap settings.
+    alpha : MCS size.
+    lag : Newey-West lag for the DM tests (default floor(T ** (1/3))).
+
+    Returns
+    -------
+    dm : pd.DataFrame indexed by (asset, model_1, model_2) (see diebold_mariano)
+    mcs : pd.DataFrame indexed by (asset, model) (see model_confidence_set)
+    """
+    if not isinstance(losses.columns, pd.MultiIndex):
+        losses = pd.concat({"asset": losses}, axis=1)
+
+    assets = list(dict.fromkeys(losses.columns.get_level_values(0)))
+    per_asset = [losses[asset].dropna() for asset in assets]
+    indices = {
+        n_obs: stationary_bootstrap_indices(n_obs, n_boot, mean_block, random_state)
+        for n_obs in sorted({len(frame) for frame in per_asset})
+    }
+
+    if n_jobs <= 1:
+        results = [_test_asset(frame, alpha, lag, indices) for frame in per_asset]
+    else:
+        workers = min(n_jobs, len(assets), os.cpu_count() or 1)
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(indices,)
+        ) as pool:
+            results = list(pool.map(
+                _test_asset, per_asset, [alpha] * len(assets), [lag] * len(assets)
+            ))
+
+    dm = pd.concat({a: res[0] for a, res in zip(assets, results)}, names=["asset"])
+    mcs = pd.concat({a: res[1] for a, res in zip(assets, results)}, names=["asset"])
+    return dm, mcs
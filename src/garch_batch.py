@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+
+# Batched GARCH-family likelihood engine.
+#
+# fit_garch_models runs one arch optimization per (asset, model); for a large
+# universe the per-call Python overhead dominates. Here the variance recursion
+# runs once per time step for all N series at the same time, the gradient of
+# the Gaussian log-likelihood is propagated through the same recursion
+# analytically, and a BFGS optimizer updates every series in one array step.
+# Conventions follow fit_garch_models / arch: returns are scaled to percent,
+# constant mean, normal errors, and the pre-sample variance is arch's
+# exponentially weighted backcast (held fixed during optimization).
+
+LOG_2PI = np.log(2.0 * np.pi)
+EGARCH_NORM_CONST = np.sqrt(2.0 / np.pi)  # E|z| for a standard normal
+
+BATCH_MODELS = {
+    "GARCH11": ["mu", "omega", "alpha[1]", "beta[1]"],
+    "GJRGARCH": ["mu", "omega", "alpha[1]", "gamma[1]", "beta[1]"],
+    "EGARCH": ["mu", "omega", "alpha[1]", "beta[1]"],
+}
+
+def _backcast(e: np.ndarray):
+    """arch's backcast: exponentially weighted mean of the first 75 squared residuals."""
+    tau = min(75, e.shape[0])
+    w = 0.94 ** np.arange(tau)
+    w /= w.sum()
+    return w @ (e[:tau] ** 2)
+
+def _starting_values(model: str, r: np.ndarray):
+    mu = r.mean(axis=0)
+    var = r.var(axis=0)
+    n = r.shape[1]
+    if model == "GARCH11":
+        return np.column_stack([mu, 0.05 * var, np.full(n, 0.1), np.full(n, 0.85)])
+    if model == "GJRGARCH":
+        return np.column_stack([mu, 0.05 * var, np.full(n, 0.05), np.full(n, 0.1), np.full(n, 0.85)])
+    if model == "EGARCH":
+        return np.column_stack([mu, 0.05 * np.log(var), np.full(n, 0.1), np.full(n, 0.95)])
+    raise ValueError(f"Unknown batch model {model!r}; choose from {list(BATCH_MODELS)}")
+
+def _feasible(model: str, params: np.ndarray):
+    if model == "EGARCH":
+        return np.abs(params[:, 3]) < 1.0
+    omega, alpha, beta = params[:, 1], params[:, 2], params[:, -1]
+    gamma = params[:, 3] if model == "GJRGARCH" else 0.0
+    return (
+        (omega > 0) & (alpha >= 0) & (alpha + gamma >= 0) & (beta >= 0)
+        & (alpha + 0.5 * gamma + beta < 1.0)
+    )
+
+def _garch_nll(params, r, bc, asym, grad=False):
+    """
+    Mean negative log-likelihood of GARCH(1,1) / GJR-GARCH(1,1) for every column.
+    Returns (nll (N,), sigma2 (T+1, N)[, gradient (N, P)]); sigma2[T] is the
+    one-step-ahead forecast.
+    """
+    T, N = r.shape
+    mu, omega, alpha, beta = params[:, 0], params[:, 1], params[:, 2], params[:, -1]
+    gamma = params[:, 3] if asym else np.zeros(N)
+
+    e = r - mu
+    e2 = e * e
+    neg = e < 0
+    # Driving term of the recursion: sigma2[t+1] = shock[t] + beta * sigma2[t]
+    shock = omega + alpha * e2 + gamma * e2 * neg
+
+    sigma2 = np.empty((T + 1, N))
+    sigma2[0] = omega + (alpha + 0.5 * gamma + beta) * bc
+    for t in range(T):
+        sigma2[t + 1] = shock[t] + beta * sigma2[t]
+
+    s = sigma2[:T]
+    nll = 0.5 * (LOG_2PI + np.log(s) + e2 / s).sum(axis=0) / T
+    if not grad:
+        return nll, sigma2
+
+    # d sigma2[t+1] / d theta = x[t] + beta * d sigma2[t] / d theta
+    P = params.shape[1]
+    x = np.empty((T, N, P))
+    x[..., 0] = -2.0 * (alpha + gamma * neg) * e
+    x[..., 1] = 1.0
+    x[..., 2] = e2
+    if asym:
+        x[..., 3] = e2 * neg
+    x[..., -1] = s
+
+    d = np.empty((T, N, P))
+    d0 = np.zeros((N, P))
+    d0[:, 1] = 1.0
+    d0[:, 2] = bc
+    if asym:
+        d0[:, 3] = 0.5 * bc
+    d0[:, -1] = bc
+    d[0] = d0
+    beta_col = beta[:, None]
+    for t in range(1, T):
+        d[t] = x[t - 1] + beta_col * d[t - 1]
+
+    dnll_ds = 0.5 * (1.0 / s - e2 / (s * s))
+    g = np.einsum("tn,tnp->np", dnll_ds, d)
+    g[:, 0] -= (e / s).sum(axis=0)
+    return nll, sigma2, g / T
+
+def _egarch_nll(params, r, lbc, grad=False):
+    """
+    Mean negative log-likelihood of EGARCH(1,1) (no asymmetry term, as in
+    fit_garch_models) for every column. Returns (nll, sigma2[, gradient]).
+    """
+    T, N = r.shape
+    mu, omega, alpha, beta = params[:, 0], params[:, 1], params[:, 2], params[:, 3]
+    e = r - mu
+
+    h = np.empty((T + 1, N))  # log variance
+    z = np.empty((T, N))
+    h[0] = omega + beta * lbc
+    for t in range(T):
+        z[t] = e[t] * np.exp(-0.5 * h[t])
+        h[t + 1] = omega + alpha * (np.abs(z[t]) - EGARCH_NORM_CONST) + beta * h[t]
+
+    nll = 0.5 * (LOG_2PI + h[:T] + z * z).sum(axis=0) / T
+    sigma2 = np.exp(h)
+    if not grad:
+        return nll, sigma2
+
+    P = params.shape[1]
+    dh = np.zeros((N, P))
+    dh[:, 1] = 1.0
+    dh[:, 3] = lbc
+    g = np.zeros((N, P))
+    alpha_col, beta_col = alpha[:, None], beta[:, None]
+    for t in range(T):
+        dz = -0.5 * z[t][:, None] * dh
+        dz[:, 0] -= np.exp(-0.5 * h[t])
+        g += 0.5 * dh + z[t][:, None] * dz
+        direct = np.zeros((N, P))
+        direct[:, 1] = 1.0
+        direct[:, 2] = np.abs(z[t]) - EGARCH_NORM_CONST
+        direct[:, 3] = h[t]
+        dh = direct + alpha_col * np.sign(z[t])[:, None] * dz + beta_col * dh
+    return nll, sigma2, g / T
+
+def _objective(model, params, r, bc, grad=False):
+    if model == "EGARCH":
+        return _egarch_nll(params, r, np.log(bc), grad=grad)
+    return _garch_nll(params, r, bc, asym=(model == "GJRGARCH"), grad=grad)
+
+def _bfgs_batch(model, r, bc, x0, max_iter=200, gtol=1e-5, ftol=1e-10):
+    """
+    Minimize the batched objective with BFGS and a per-series backtracking
+    (Armijo) line search. Steps that leave the stationarity/positivity region
+    are shortened before any likelihood is evaluated.
+    """
+    n, P = x0.shape
+    x = x0.copy()
+    f, _, g = _objective(model, x, r, bc, grad=True)
+    H = np.tile(np.eye(P), (n, 1, 1)) * (0.1 / (np.abs(g).max(axis=1) + 1e-8))[:, None, None]
+    first_update = np.ones(n, dtype=bool)
+    active = np.isfinite(f)
+    n_iter = np.zeros(n, dtype=int)
+
+    for _ in range(max_iter):
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+        p = -np.einsum("nij,nj->ni", H[idx], g[idx])
+        slope = (g[idx] * p).sum(axis=1)
+        uphill = slope >= 0
+        if uphill.any():
+            # Lost positive definiteness: restart from steepest descent
+            H[idx[uphill]] = np.eye(P) * (0.1 / (np.abs(g[idx[uphill]]).max(axis=1) + 1e-8))[:, None, None]
+            p[uphill] = -np.einsum("nij,nj->ni", H[idx[uphill]], g[idx[uphill]])
+            slope = (g[idx] * p).sum(axis=1)
+
+        step = np.ones(idx.size)
+        f_new = np.full(idx.size, np.nan)
+        pending = np.ones(idx.size, dtype=bool)
+        for _ls in range(40):
+            cand = x[idx] + step[:, None] * p
+            ok = pending & _feasible(model, cand)
+            if ok.any():
+                fc, _ = _objective(model, cand[ok], r[:, idx[ok]], bc[idx[ok]])
+                armijo = np.isfinite(fc) & (fc <= f[idx[ok]] + 1e-4 * step[ok] * slope[ok])
+                accepted = np.flatnonzero(ok)[armijo]
+                f_new[accepted] = fc[armijo]
+                pending[accepted] = False
+            if not pending.any():
+                break
+            step[pending] *= 0.5
+
+        moved = ~pending
+        # Series whose line search failed cannot improve further
+        active[idx[pending]] = False
+        if not moved.any():
+            break
+
+        mi = idx[moved]
+        x_new = x[mi] + step[moved, None] * p[moved]
+        _, _, g_new = _objective(model, x_new, r[:, mi], bc[mi], grad=True)
+        s = x_new - x[mi]
+        y = g_new - g[mi]
+        sy = (s * y).sum(axis=1)
+
+        # Scale the initial inverse Hessian on the first successful step
+        scale = first_update[mi] & (sy > 1e-12)
+        if scale.any():
+            yy = (y[scale] ** 2).sum(axis=1)
+            H[mi[scale]] = np.eye(P) * (sy[scale] / yy)[:, None, None]
+            first_update[mi[scale]] = False
+
+        upd = sy > 1e-12
+        if upd.any():
+            Hu, su, yu = H[mi[upd]], s[upd], y[upd]
+            rho = 1.0 / sy[upd]
+            Hy = np.einsum("nij,nj->ni", Hu, yu)
+            yHy = (yu * Hy).sum(axis=1)
+            H[mi[upd]] = (
+                Hu
+                - rho[:, None, None] * (np.einsum("ni,nj->nij", su, Hy) + np.einsum("ni,nj->nij", Hy, su))
+                + (rho * (1.0 + rho * yHy))[:, None, None] * np.einsum("ni,nj->nij", su, su)
+            )
+
+        f_old = f[mi]
+        x[mi], f[mi], g[mi] = x_new, f_new[moved], g_new
+        n_iter[mi] += 1
+        done = (np.abs(g_new).max(axis=1) < gtol) | (np.abs(f_old - f[mi]) < ftol * (1.0 + np.abs(f_old)))
+        active[mi[done]] = False
+
+    converged = np.abs(g).max(axis=1) < np.sqrt(gtol)
+    return x, f, n_iter, converged
+
+def fit_garch_batch(
+    returns: pd.DataFrame,
+    models=("GARCH11", "EGARCH", "GJRGARCH"),
+    max_iter: int = 200
+):
+    """
+    Fit GARCH-family models to every column of a (T x N) returns panel at once.
+
+    Parameters
+    ----------
+    returns : pd.DataFrame
+        Log returns (fractions), one column per asset, no missing values
+        (e.g. load_universe(..., how="inner")).
+    models : iterable of str
+        Any of "GARCH11", "GJRGARCH", "EGARCH".
+    max_iter : int
+        Maximum BFGS iterations per model.
+
+    Returns
+    -------
+    params_dict : {model_name: DataFrame (asset x parameter)} with loglik,
+        iterations and a converged flag appended.
+    forecasts_df : DataFrame with columns
+        [asset, model, last_date, one_day_ahead_vol_forecast_pct], as in fit_garch_models.
+    cond_vol_dict : {model_name: DataFrame (date x asset) of conditional volatility (%)}
+    """
+    if returns.isna().to_numpy().any():
+        raise ValueError("fit_garch_batch needs a complete panel; drop or align missing values first")
+
+    r = returns.to_numpy(dtype="float64") * 100.0
+    T = r.shape[0]
+    assets = list(returns.columns)
+    bc = _backcast(r - r.mean(axis=0))
+
+    params_dict, cond_vol_dict, forecasts_records = {}, {}, []
+    for model in models:
+        x0 = _starting_values(model, r)
+        x, nll, n_iter, converged = _bfgs_batch(model, r, bc, x0, max_iter=max_iter)
+        _, sigma2 = _objective(model, x, r, bc)
+        vol = np.sqrt(sigma2)
+
+        params = pd.DataFrame(x, index=assets, columns=BATCH_MODELS[model])
+        params["loglik"] = -nll * T
+        params["iterations"] = n_iter
+        params["converged"] = converged
+        params_dict[model] = params
+        cond_vol_dict[model] = pd.DataFrame(vol[:T], index=returns.index, columns=assets)
+
+        for j, asset in enumerate(assets):
+            forecasts_records.append({
+                "asset": asset,
+                "model": model,
+                "last_date": returns.index[-1],
+                "one_day_ahead_vol_forecast_pct": float(vol[T, j]),
+            })
+
+    forecasts_df = pd.DataFrame(forecasts_records)
+    return params_dict, forecasts_df, cond_vol_dict
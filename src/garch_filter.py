@@ -0,0 +1,142 @@
+import math
+import pandas as pd
+
+EGARCH_NORM_CONST = math.sqrt(2.0 / math.pi)  # E|z| for a standard normal, as in arch
+
+def init_filter_state(res, model_name: str = None):
+    """
+    Build an incremental filter state from a fitted arch result
+    (one entry of the models_dict returned by fit_garch_models).
+
+    Supported: GARCH(1,1), GJR-GARCH(1,1,1) and EGARCH(1,1) with an optional
+    asymmetry term, constant or zero mean. Parameters are frozen; the state only
+    carries what the variance recursion needs for the next step.
+
+    Returns
+    -------
+    dict with keys:
+        'model' : model name
+        'kind' : "GARCH" or "EGARCH"
+        'params' : {mu, omega, alpha, gamma, beta}
+        'sigma2_next' : conditional variance forecast for the next return (% units)
+        'last_date' : date of the last observation absorbed
+        'n_updates' : observations absorbed since the fit
+        'z2_sum' : running sum of squared standardized residuals since the fit
+        'z2_var' : variance of the squared standardized residuals of the fit
+    """
+    vol = res.model.volatility
+    kind = type(vol).__name__
+    if kind not in ("GARCH", "EGARCH") or vol.p != 1 or vol.q != 1 or vol.o > 1:
+        raise ValueError(
+            f"incremental updates support (GJR-)GARCH(1,1) and EGARCH(1,1), got {res.model.volatility}"
+        )
+    if kind == "GARCH" and getattr(vol, "power", 2.0) != 2.0:
+        raise ValueError("incremental updates need a variance (power=2) GARCH model")
+
+    params = res.params
+    if "mu" in params.index:
+        mu = float(params["mu"])
+    elif type(res.model).__name__ == "ZeroMean":
+        mu = 0.0
+    else:
+        raise ValueError("incremental updates support constant or zero mean models only")
+
+    fcast = res.forecast(horizon=1, reindex=False)
+    # Var[z^2] is 2 only for normal innovations (8 for a t with 5 degrees of
+    # freedom), so take it from the fit's own standardized residuals
+    z2_var = float((res.std_resid.dropna() ** 2).var())
+    return {
+        "model": model_name,
+        "kind": kind,
+        "params": {
+            "mu": mu,
+            "omega": float(params["omega"]),
+            "alpha": float(params["alpha[1]"]),
+            "gamma": float(params["gamma[1]"]) if vol.o == 1 else 0.0,
+            "beta": float(params["beta[1]"]),
+        },
+        "sigma2_next": float(fcast.variance.values[-1, 0]),
+        "last_date": res.resid.index[-1],
+        "n_updates": 0,
+        "z2_sum": 0.0,
+        "z2_var": z2_var,
+    }
+
+def init_filter_states(models_dict: dict):
+    """Filter states for every fitted model in a models_dict."""
+    return {name: init_filter_state(res, name) for name, res in models_dict.items()}
+
+def update_filter_state(state: dict, ret: float, date=None):
+    """
+    Absorb one new return (fraction, same units as fit_garch_models' input) and
+    advance the variance recursion with the frozen parameters. O(1) per call.
+    The state is updated in place and the new one-day-ahead volatility
+    forecast (% terms) is returned.
+    """
+    p = state["params"]
+    e = ret * 100.0 - p["mu"]
+    sigma2 = state["sigma2_next"]
+    z = e / math.sqrt(sigma2)
+
+    if state["kind"] == "GARCH":
+        sigma2_next = (
+            p["omega"] + p["alpha"] * e * e
+            + (p["gamma"] * e * e if e < 0 else 0.0)
+            + p["beta"] * sigma2
+        )
+    else:
+        log_sigma2_next = (
+            p["omega"] + p["alpha"] * (abs(z) - EGARCH_NORM_CONST)
+            + p["gamma"] * z + p["beta"] * math.log(sigma2)
+        )
+        sigma2_next = math.exp(log_sigma2_next)
+
+    state["sigma2_next"] = sigma2_next
+    state["n_updates"] += 1
+    state["z2_sum"] += z * z
+    if date is not None:
+        state["last_date"] = date
+    return math.sqrt(sigma2_next)
+
+def update_filter_states(states: dict, new_returns: pd.Series, asset_name: str = None):
+    """
+    Advance every model state through one or more new returns (a Series indexed
+    by date, in order).
+
+    Returns
+    -------
+    forecasts_df : DataFrame with columns
+        [asset, model, last_date, one_day_ahead_vol_forecast_pct], as in fit_garch_models.
+    """
+    records = []
+    for name, state in states.items():
+        vol = math.sqrt(state["sigma2_next"])
+        for date, ret in new_returns.items():
+            vol = update_filter_state(state, float(ret), date)
+        records.append({
+            "asset": asset_name,
+            "model": name,
+            "last_date": state["last_date"],
+            "one_day_ahead_vol_forecast_pct": vol,
+        })
+    return pd.DataFrame(records)
+
+def needs_refit(state: dict, max_updates: int = 60, drift_z: float = 3.0, min_updates: int = 20):
+    """
+    Decide whether a full re-estimation is due.
+
+    True when the scheduled number of updates since the fit is reached, or when
+    the parameters look stale: under a correctly specified model the
+    standardized residuals have E[z^2] = 1, so the mean of z^2 since the fit
+    is compared with 1 using a z-test at `drift_z` standard errors (once at
+    least `min_updates` observations are in). The standard error uses the
+    variance of z^2 of the fit ('z2_var'), which depends on the innovation
+    distribution's fourth moment.
+    """
+    n = state["n_updates"]
+    if max_updates is not None and n >= max_updates:
+        return True
+    if n < max(min_updates, 1):
+        return False
+    mean_z2 = state["z2_sum"] / n
+    return abs(mean_z2 - 1.0) / math.sqrt(state["z2_var"] / n) > drift_z
@@ -1,59 +1,364 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from arch import arch_model
-from statsmodels.stats.diagnostic import acorr_ljungbox
-from scipy import stats
+from garch_filter import init_filter_state, EGARCH_NORM_CONST
+from fit_cache import fit_cache_key, cache_get, cache_put
+from instrumentation import span, call_traced, merge_events
+
+# Default model set: each spec is a name plus arch_model keyword arguments
+DEFAULT_GARCH_SPECS = [
+    {"name": "GARCH11", "vol": "GARCH", "p": 1, "q": 1, "mean": "Constant", "dist": "normal"},
+    {"name": "EGARCH", "vol": "EGARCH", "p": 1, "q": 1, "mean": "Constant", "dist": "normal"},
+    {"name": "GJRGARCH", "vol": "GARCH", "p": 1, "o": 1, "q": 1, "mean": "Constant", "dist": "normal"},
+]
+
+# Innovation distributions and mean models of garch_spec_grid (arch names)
+GARCH_DISTS = ("normal", "t", "skewt")
+GARCH_MEANS = ("Constant",)
+
+FORECAST_HORIZONS = (1, 5, 10, 22)
+
+# Returns shared with fit worker processes (set once per worker by _init_fit_worker)
+_FIT_RETURNS = None
+
+def garch_spec_grid(vol_specs=None, dists=GARCH_DISTS, means=GARCH_MEANS):
+    """
+    Spec grid of volatility process x innovation distribution x mean model,
+    for fit_garch_models(specs=...).
+
+    Parameters
+    ----------
+    vol_specs : list of dicts, optional
+        Volatility processes as named specs (default: the processes of
+        DEFAULT_GARCH_SPECS); their dist and mean entries are replaced.
+    dists : sequence of str
+        arch distribution names, e.g. "normal", "t", "skewt", "ged".
+    means : sequence of str or dict
+        arch mean models, e.g. "Constant", "Zero", or {"mean": "AR", "lags": 1}.
+
+    Returns
+    -------
+    list of specs named '<process>-<dist>-<mean>', e.g. 'EGARCH-skewt-Constant'.
+    """
+    if vol_specs is None:
+        vol_specs = DEFAULT_GARCH_SPECS
+    specs = []
+    for vol_spec in vol_specs:
+        base = {k: v for k, v in vol_spec.items() if k not in ("name", "dist", "mean")}
+        for mean in means:
+            mean_kwargs = {"mean": mean} if isinstance(mean, str) else dict(mean)
+            mean_label = mean_kwargs["mean"] + "".join(
+                str(v) for k, v in mean_kwargs.items() if k != "mean"
+            )
+            for dist in dists:
+                specs.append({
+                    "name": f"{vol_spec['name']}-{dist}-{mean_label}",
+                    **base, **mean_kwargs, "dist": dist,
+                })
+    return specs
+
+def _simulated_variance(res, shocks, chunk: int = 2000):
+    """
+    Mean simulated conditional variance at horizons 1..H (% units) for a fitted
+    (GJR-)GARCH(1,1) or EGARCH(1,1) result, given standard normal shocks of
+    shape (n_paths, H - 1). Non-normal models map the same draws through
+    their own quantile function, so every model sees the same shock paths.
+    Paths are advanced `chunk` at a time to bound memory.
+    """
+    from scipy.special import ndtr as norm_cdf
+
+    state = init_filter_state(res)
+    p = state["params"]
+    dist = res.model.distribution
+    dist_params = res.params.to_numpy()[len(res.params) - dist.num_params:]
+    n_paths, steps = shocks.shape
+
+    total = np.zeros(steps + 1)
+    total[0] = state["sigma2_next"] * n_paths
+    for start in range(0, n_paths, chunk):
+        z = shocks[start:start + chunk]
+        if type(dist).__name__ != "Normal":
+            z = dist.ppf(norm_cdf(z).ravel(), dist_params).reshape(z.shape)
+        sigma2 = np.full(len(z), state["sigma2_next"])
+        for h in range(steps):
+            if state["kind"] == "GARCH":
+                e2 = sigma2 * z[:, h] ** 2
+                sigma2 = (
+                    p["omega"] + p["alpha"] * e2 + p["gamma"] * e2 * (z[:, h] < 0)
+                    + p["beta"] * sigma2
+                )
+            else:
+                sigma2 = np.exp(
+                    p["omega"] + p["alpha"] * (np.abs(z[:, h]) - EGARCH_NORM_CONST)
+                    + p["gamma"] * z[:, h] + p["beta"] * np.log(sigma2)
+                )
+            total[h + 1] += sigma2.sum()
+    return total / n_paths
+
+def forecast_horizons(
+    models_dict: dict,
+    asset_name: str,
+    horizons=FORECAST_HORIZONS,
+    n_paths: int = 10000,
+    chunk: int = 2000,
+    random_state=42
+):
+    """
+    Multi-horizon volatility forecasts from fitted models (e.g. the models_dict
+    of fit_garch_models).
+
+    Analytic forecasts are used where arch provides them (GARCH/GJR-GARCH with
+    power 2, and any model at horizon 1). Otherwise (EGARCH beyond one step)
+    the variance paths are simulated from one pre-drawn shock matrix shared by
+    all models, `n_paths` paths generated `chunk` at a time. Models the shared
+    simulation does not cover (e.g. AR or HAR means) use arch's own
+    simulation forecast with `n_paths` paths.
+
+    Returns
+    -------
+    pd.DataFrame in long format with columns
+        [asset, model, last_date, horizon, method, vol_forecast_pct, cum_vol_forecast_pct]
+        vol_forecast_pct: daily volatility expected h days ahead (% terms)
+        cum_vol_forecast_pct: volatility of the cumulative return over days 1..h
+    """
+    max_h = max(horizons)
+    shocks = np.random.default_rng(random_state).standard_normal((n_paths, max_h - 1))
+
+    records = []
+    for model_name, res in models_dict.items():
+        try:
+            fcast = res.forecast(horizon=max_h, reindex=False)
+            variance = fcast.variance.values[-1]
+            method = "analytic"
+        except ValueError:
+            method = "simulation"
+            try:
+                variance = _simulated_variance(res, shocks, chunk=chunk)
+            except ValueError:
+                fcast = res.forecast(
+                    horizon=max_h, method="simulation", simulations=n_paths, reindex=False,
+                    random_state=np.random.RandomState(random_state)
+                )
+                variance = fcast.variance.values[-1]
+        cum_variance = np.cumsum(variance)
+        for h in horizons:
+            records.append({
+                "asset": asset_name,
+                "model": model_name,
+                "last_date": res.resid.index[-1],
+                "horizon": h,
+                "method": method,
+                "vol_forecast_pct": float(np.sqrt(variance[h - 1])),
+                "cum_vol_forecast_pct": float(np.sqrt(cum_variance[h - 1])),
+            })
+    return pd.DataFrame(records)
+
+def _fit_spec(r: pd.Series, spec: dict, warm_start=None):
+    """
+    Fit one arch_model specification (top-level so it can run in a worker process).
+
+    warm_start : optional (params, std_resid, loglik) of a fitted model with
+        the same mean and volatility process under normal innovations; its
+        parameters, followed by the distribution's own starting values for its
+        standardized residuals, start the optimizer. The normal model is nested
+        (e.g. t with nu -> inf), so a warm fit ending below its log-likelihood
+        went astray and is refitted from arch's default starting values.
+    """
+    import warnings
+    from arch import arch_model
+    from arch.utility.exceptions import StartingValueWarning
+
+    model_kwargs = {k: v for k, v in spec.items() if k != "name"}
+    model = arch_model(r, **model_kwargs)
+    starting_values, floor = None, -np.inf
+    if warm_start is not None:
+        params, std_resid, floor = warm_start
+        starting_values = np.r_[params, model.distribution.starting_values(std_resid)]
+    with span(spec["name"], "garch_fit", n_obs=len(r), warm_start=warm_start is not None) as info:
+        # Starting values outside the constraints are replaced by arch's own
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", StartingValueWarning)
+            res = model.fit(starting_values=starting_values, disp="off")
+        info["iterations"] = int(res.optimization_result.nit)
+        info["likelihood_evals"] = int(res.optimization_result.nfev)
+        if res.loglikelihood < floor:
+            cold = model.fit(disp="off")
+            info["cold_refit"] = True
+            info["iterations"] += int(cold.optimization_result.nit)
+            info["likelihood_evals"] += int(cold.optimization_result.nfev)
+            res = max(res, cold, key=lambda fit: fit.loglikelihood)
+        info["loglik"] = float(res.loglikelihood)
+    return res
+
+def _init_fit_worker(r):
+    global _FIT_RETURNS
+    _FIT_RETURNS = r
+
+def _fit_shared(spec: dict, warm_start=None):
+    return _fit_spec(_FIT_RETURNS, spec, warm_start)
+
+def _normal_partner(spec: dict, specs):
+    """Index of the spec with the same mean and volatility process under normal innovations."""
+    if spec.get("dist", "normal") == "normal":
+        return None
+    target = {k: v for k, v in spec.items() if k not in ("name", "dist")}
+    for j, other in enumerate(specs):
+        if other.get("dist", "normal") == "normal" and \
+                {k: v for k, v in other.items() if k not in ("name", "dist")} == target:
+            return j
+    return None
+
+def rank_garch_models(models_dict: dict, asset_name: str = None, criterion: str = "bic"):
+    """
+    Table of fitted models ranked by information criterion.
+
+    Parameters
+    ----------
+    criterion : {"bic", "aic", "loglik"}
+        Ranking key; BIC and AIC rank ascending, the log-likelihood descending.
+
+    Returns
+    -------
+    pd.DataFrame with columns
+        [asset, model, mean, vol, dist, n_obs, n_params, loglik, aic, bic, rank],
+        best model first.
+    """
+    if criterion not in ("bic", "aic", "loglik"):
+        raise ValueError(f"criterion must be 'bic', 'aic' or 'loglik', got {criterion!r}")
+    ranking = pd.DataFrame([
+        {
+            "asset": asset_name,
+            "model": name,
+            "mean": res.model.name,
+            "vol": res.model.volatility.name,
+            "dist": res.model.distribution.name,
+            "n_obs": int(res.nobs),
+            "n_params": int(res.num_params),
+            "loglik": float(res.loglikelihood),
+            "aic": float(res.aic),
+            "bic": float(res.bic),
+        }
+        for name, res in models_dict.items()
+    ])
+    ranking = ranking.sort_values(criterion, ascending=criterion != "loglik", kind="stable")
+    ranking["rank"] = np.arange(1, len(ranking) + 1)
+    return ranking.reset_index(drop=True)
 
 def fit_garch_models(
     returns: pd.Series,
     asset_name: str,
     results_dir: str = "../results",
-    figs_dir: str = "../results/figures"
+    figs_dir: str = "../results/figures",
+    specs=None,
+    n_jobs: int = 1,
+    make_figures: bool = True,
+    cache_dir: str = None,
+    criterion: str = "bic"
 ):
     """
-    Fit GARCH(1,1), EGARCH(1,1), and GJR-GARCH(1,1) models to a return series.
+    Fit a set of GARCH-family models to a return series
+    (default: GARCH(1,1), EGARCH(1,1), and GJR-GARCH(1,1)), or a whole grid
+    of volatility process x distribution x mean model (see garch_spec_grid).
 
     Outputs:
         - Conditional volatility plots
         - QQ-plots with Ljung-Box p-value annotation
         - 1-step-ahead volatility forecast
+        - '<asset>_garch_ranking.csv': models ranked by `criterion` (see rank_garch_models)
+        - '<asset>_cond_vol.csv' and '<asset>_std_resid.csv' in results_dir,
+          from which the plots can be redrawn later (visualization.render_figures)
+
+    Parameters:
+        specs: list of dicts, each with a 'name' plus arch_model keyword arguments
+            (vol, p, o, q, mean, dist, ...). Defaults to DEFAULT_GARCH_SPECS.
+            Normal-innovation specs are fitted first; a spec differing from one
+            of them only in `dist` is warm-started from its parameters.
+        n_jobs: number of worker processes used to fit the specs concurrently
+            (1 = fit sequentially in this process). The returns are sent to
+            each worker once.
+        make_figures: draw the plots; False skips them without importing pyplot.
+        cache_dir: fit cache directory (see fit_cache). Each spec's fitted result
+            is stored under a hash of the returns, the spec and library versions,
+            and only specs without a cached result are refitted.
+        criterion: "bic", "aic" or "loglik", the ranking key.
 
     Returns:
-        models_dict: dict of fitted model result objects
-        forecasts_df: DataFrame with one-day-ahead volatility forecasts
+        models_dict: dict of fitted model result objects, in spec order
+        forecasts_df: DataFrame with one-day-ahead volatility forecasts plus the
+            ranking columns (loglik, aic, bic, rank, ...), best model first
         cond_vol_dict: {model_name: Series of conditional volatility (% terms)}
     """
     os.makedirs(results_dir, exist_ok=True)
-    os.makedirs(figs_dir, exist_ok=True)
+
+    if specs is None:
+        specs = DEFAULT_GARCH_SPECS
+    names = [spec["name"] for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"GARCH spec names must be unique, got {names}")
 
     # Drop NaN and scale to percent to stabilize fitting
     r = returns.dropna() * 100.0
 
-    models_dict = {}
+    fitted = [None] * len(specs)
+    if cache_dir is not None:
+        keys = [fit_cache_key(r, spec, "garch") for spec in specs]
+        fitted = [cache_get(cache_dir, key) for key in keys]
+    todo = [i for i, res in enumerate(fitted) if res is None]
 
-    # 1️⃣ GARCH(1,1)
-    garch11 = arch_model(r, vol="GARCH", p=1, q=1, mean="Constant", dist="normal")
-    garch11_res = garch11.fit(disp="off")
-    models_dict["GARCH11"] = garch11_res
+    # Normal-innovation fits first; a non-normal spec whose normal partner is
+    # in the grid then starts from that partner's parameters
+    partners = {i: _normal_partner(specs[i], specs) for i in todo}
+    rounds = [
+        [i for i in todo if partners[i] is None],
+        [i for i in todo if partners[i] is not None],
+    ]
 
-    # 2️⃣ EGARCH(1,1)
-    egarch = arch_model(r, vol="EGARCH", p=1, q=1, mean="Constant", dist="normal")
-    egarch_res = egarch.fit(disp="off")
-    models_dict["EGARCH"] = egarch_res
+    def warm_start(i):
+        j = partners[i]
+        if j is None:
+            return None
+        partner = fitted[j]
+        return (partner.params.to_numpy(), partner.std_resid.dropna().to_numpy(),
+                float(partner.loglikelihood))
 
-    # 3️⃣ GJR-GARCH(1,1)
-    gjr = arch_model(r, vol="GARCH", p=1, o=1, q=1, mean="Constant", dist="normal")
-    gjr_res = gjr.fit(disp="off")
-    models_dict["GJRGARCH"] = gjr_res
+    # Each spec is an independent optimization over the same return vector,
+    # handed to every worker once by the pool initializer
+    pool = None
+    if n_jobs > 1 and len(todo) > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=min(n_jobs, len(todo)), initializer=_init_fit_worker, initargs=(r,)
+        )
+    try:
+        for batch in rounds:
+            starts = [warm_start(i) for i in batch]
+            if pool is not None and len(batch) > 1:
+                traced = list(pool.map(
+                    call_traced, [_fit_shared] * len(batch),
+                    [(specs[i], start) for i, start in zip(batch, starts)]
+                ))
+                results = [res for res, _ in traced]
+                for _, events in traced:
+                    merge_events(events)
+            else:
+                results = [_fit_spec(r, specs[i], start) for i, start in zip(batch, starts)]
+            for i, res in zip(batch, results):
+                fitted[i] = res
+                if cache_dir is not None:
+                    cache_put(cache_dir, keys[i], res)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    models_dict = dict(zip(names, fitted))
 
     forecasts_records = []
     cond_vol_dict = {}
+    std_resid_dict = {}
 
     for model_name, res in models_dict.items():
         cond_vol = res.conditional_volatility  # pct volatility
         cond_vol_dict[model_name] = cond_vol
+        std_resid_dict[model_name] = res.std_resid
 
         # One-step-ahead forecast
         fcast = res.forecast(horizon=1, reindex=False)
@@ -67,30 +372,28 @@ def fit_garch_models(
             "one_day_ahead_vol_forecast_pct": float(vol_fcast),
         })
 
-        # 📈 Plot conditional volatility
-        plt.figure()
-        plt.plot(cond_vol.index, cond_vol, label=f"{model_name} cond. vol")
-        plt.title(f"{asset_name}: {model_name} conditional volatility")
-        plt.xlabel("Date")
-        plt.ylabel("Vol (%)")
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(os.path.join(figs_dir, f"{asset_name}_{model_name}_volatility.png"))
-        plt.close()
-
-        # 📊 Residual diagnostics: QQ-plot + Ljung-Box test
-        std_resid = res.std_resid.dropna()
-        lb_stat, lb_p = acorr_ljungbox(std_resid, lags=[10], return_df=False)
-
-        plt.figure()
-        stats.probplot(std_resid, dist="norm", plot=plt)
-        plt.title(
-            f"{asset_name}: {model_name} standardized residual QQ-plot\n"
-            f"Ljung-Box p(10)={lb_p[0]:.3f}"
-        )
-        plt.tight_layout()
-        plt.savefig(os.path.join(figs_dir, f"{asset_name}_{model_name}_qqplot.png"))
-        plt.close()
+    # Numeric artifacts behind the figures, so plots can be rendered on demand
+    pd.DataFrame(cond_vol_dict).to_csv(
+        os.path.join(results_dir, f"{asset_name}_cond_vol.csv"), index_label="date"
+    )
+    pd.DataFrame(std_resid_dict).to_csv(
+        os.path.join(results_dir, f"{asset_name}_std_resid.csv"), index_label="date"
+    )
+
+    if make_figures:
+        from visualization import plot_garch_volatility, plot_residual_qq
+
+        with span(f"{asset_name} GARCH figures", "plot"):
+            for model_name in models_dict:
+                # 📈 Conditional volatility
+                plot_garch_volatility(asset_name, model_name, cond_vol_dict[model_name], figs_dir)
+                # 📊 Residual diagnostics: QQ-plot + Ljung-Box test
+                plot_residual_qq(asset_name, model_name, std_resid_dict[model_name], figs_dir)
 
-    forecasts_df = pd.DataFrame(forecasts_records)
+    # Forecast table ranked by information criterion, best model first
+    ranking = rank_garch_models(models_dict, asset_name, criterion=criterion)
+    ranking.to_csv(os.path.join(results_dir, f"{asset_name}_garch_ranking.csv"), index=False)
+    forecasts_df = pd.DataFrame(forecasts_records).merge(
+        ranking.drop(columns="asset"), on="model"
+    ).sort_values("rank", kind="stable").reset_index(drop=True)
     return models_dict, forecasts_df, cond_vol_dict
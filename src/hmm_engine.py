@@ -0,0 +1,327 @@
+from types import SimpleNamespace
+import numpy as np
+
+# In-project Gaussian HMM (full covariances) fitted by Baum-Welch.
+#
+# Every array carries a leading batch axis B, so many independent sequences
+# (e.g. one per asset, all of the same length) are fitted in the same array
+# operations. Emission log-densities and the M-step statistics are single
+# batched matrix products against fixed quadratic features of X (x_i x_j,
+# x_i, 1). Forward-backward is a blocked scan: the T steps are cut into about
+# sqrt(T) chunks of about sqrt(T) steps, the transfer matrices of all chunks
+# are accumulated side by side, and only the chunk boundaries are chained
+# one after another, so a pass costs about 4 sqrt(T) array operations instead
+# of 2 T tiny ones. Inside the E-step the state axes come first, so those
+# operations run on contiguous (sequence, chunk) arrays rather than reducing
+# over tiny trailing K axes. Emissions are shifted by their per-step maximum and every
+# running product is renormalized, so nothing under- or overflows. Viterbi
+# runs in log space on the emissions of the last E-step. EM stops after an
+# E-step, so the returned posteriors and log-likelihood belong to the
+# returned parameters and no extra predict / predict_proba pass is needed.
+# Sequences that have converged drop out of the E- and M-steps.
+
+def _features(X):
+    """Quadratic features of X (B,T,D): [x_i x_j for i <= j, x_i, 1] -> (B,T,F)."""
+    D = X.shape[-1]
+    iu, ju = np.triu_indices(D)
+    return np.concatenate([X[..., iu] * X[..., ju], X, np.ones(X.shape[:-1] + (1,))], axis=-1)
+
+def _log_emissions(X, means, covars, feats=None):
+    """log N(x_t | mean_k, cov_k) for X (B,T,D) -> (B,T,K)."""
+    D = X.shape[-1]
+    if feats is None:
+        feats = _features(X)
+    prec = np.linalg.inv(covars)                      # (B,K,D,D)
+    _, logdet = np.linalg.slogdet(covars)             # (B,K)
+    # (x-m)' P (x-m) = sum_{i<=j} c_ij x_i x_j - 2 (P m)' x + m' P m
+    iu, ju = np.triu_indices(D)
+    pm = np.einsum("bkde,bke->bkd", prec, means)
+    coef = np.concatenate([
+        prec[..., iu, ju] * np.where(iu == ju, 1.0, 2.0),
+        -2.0 * pm,
+        (means * pm).sum(axis=-1, keepdims=True),
+    ], axis=-1)                                       # (B,K,F)
+    maha = np.matmul(feats, coef.transpose(0, 2, 1))  # (B,T,K)
+    return -0.5 * (D * np.log(2.0 * np.pi) + logdet[:, None, :] + maha)
+
+def _chunks(T):
+    L = max(1, int(np.ceil(np.sqrt(T))))
+    return -(-T // L), L
+
+def _forward_backward(startprob, trans, b):
+    """
+    Blocked-scan forward-backward on shifted emissions b (K,B,T).
+
+    The step matrices are M_0 = diag(b_0) and M_t = A diag(b_t), so the
+    forward vector is alpha_t = pi' M_0 ... M_t and the backward vector
+    beta_t = M_{t+1} ... M_{T-1} 1. T is padded to C chunks of L steps with
+    b = 1, which leaves both unchanged (the rows of A sum to one). Only the
+    C chunk products are kept as matrices; alpha and beta inside the chunks
+    are then filled in by vector recursions run over all chunks at once.
+    The state axes come first and (sequence, chunk) last, so every step is a
+    few elementwise operations on contiguous (B,C) arrays.
+
+    Returns
+    -------
+    alpha, beta : (K,B,T), each normalized to sum to one at every step
+    log_norm : (B,) log p(y_1..y_T) of the shifted emissions
+    """
+    K, B, T = b.shape
+    C, L = _chunks(T)
+    bp = np.ones((K, B, C, L))
+    bp.reshape(K, B, C * L)[..., :T] = b
+    bp = np.ascontiguousarray(bp.transpose(0, 3, 1, 2))                  # (K,L,B,C)
+    At = np.ascontiguousarray(
+        np.broadcast_to(trans.transpose(1, 2, 0)[..., None], (K, K, B, C))
+    )                                                                     # (K,K,B,C)
+
+    # Product of the L step matrices of every chunk, rescaled by its largest
+    # entry after each step
+    P = At * bp[None, :, 0]
+    P[..., 0] = np.eye(K)[:, :, None] * bp[None, :, 0, :, 0]
+    log_norm = np.zeros(B)
+    for l in range(1, L):
+        P = (P[:, :, None] * At[None]).sum(axis=1) * bp[None, :, l]
+        m = P.max(axis=(0, 1))
+        P /= m
+        log_norm += np.log(m).sum(axis=1)
+
+    # Chain the chunk boundaries: v[..., c] is alpha just before chunk c,
+    # z[..., c] is beta at the end of chunk c
+    v = np.empty((K, B, C))
+    z = np.empty((K, B, C))
+    v[..., 0] = startprob.T
+    z[..., -1] = 1.0
+    for c in range(C):
+        w = (v[:, None, :, c] * P[..., c]).sum(axis=0)
+        n = w.sum(axis=0)
+        log_norm += np.log(n)
+        if c + 1 < C:
+            v[..., c + 1] = w / n
+            y = (P[..., C - 1 - c] * z[None, :, :, C - 1 - c]).sum(axis=1)
+            z[..., C - 2 - c] = y / y.sum(axis=0)
+
+    alpha = np.empty((K, B, C, L))
+    beta = np.empty((K, B, C, L))
+    a = (v[:, None] * At).sum(axis=0) * bp[:, 0]
+    a[..., 0] = v[..., 0] * bp[:, 0, :, 0]
+    a /= a.sum(axis=0)
+    e = z
+    alpha[..., 0] = a
+    beta[..., -1] = e
+    for l in range(1, L):
+        a = (a[:, None] * At).sum(axis=0) * bp[:, l]
+        a /= a.sum(axis=0)
+        alpha[..., l] = a
+        e = (At * (bp[:, L - l] * e)[None]).sum(axis=1)
+        e /= e.sum(axis=0)
+        beta[..., L - 1 - l] = e
+    alpha = alpha.reshape(K, B, C * L)[..., :T]
+    beta = beta.reshape(K, B, C * L)[..., :T]
+    return alpha, beta, log_norm
+
+def _e_step(X, startprob, transmat, means, covars, feats=None):
+    log_b = _log_emissions(X, means, covars, feats)
+    b = np.ascontiguousarray(log_b.transpose(2, 0, 1))                    # (K,B,T)
+    shift = b.max(axis=0)                                                 # (B,T)
+    b -= shift
+    np.exp(b, out=b)
+    alpha, beta, log_norm = _forward_backward(startprob, transmat, b)
+    loglik = log_norm + shift.sum(axis=1)                                 # (B,)
+    posteriors = alpha * beta
+    posteriors /= posteriors.sum(axis=0)                                  # (K,B,T)
+    # Expected transition counts: xi_t(i,j) is proportional to
+    # alpha_t(i) A(i,j) b_{t+1}(j) beta_{t+1}(j) and sums to one over (i,j);
+    # summed over t as one batched matrix product
+    g = b[..., 1:] * beta[..., 1:]                                        # (K,B,T-1)
+    ag = np.matmul(transmat, g.transpose(1, 0, 2)).transpose(1, 0, 2)    # (K,B,T-1)
+    norm = (alpha[..., :-1] * ag).sum(axis=0)                             # (B,T-1)
+    trans_counts = transmat * np.matmul(
+        (alpha[..., :-1] / norm).transpose(1, 0, 2), g.transpose(1, 2, 0)
+    )                                                                     # (B,K,K)
+    return loglik, posteriors.transpose(1, 2, 0), trans_counts, log_b
+
+def _floor_eigenvalues(covars, min_covar):
+    """Raise covariance eigenvalues below min_covar to it (no-op for well-conditioned fits)."""
+    w, v = np.linalg.eigh(covars)
+    if not (w < min_covar).any():
+        return covars
+    return np.matmul(v * np.maximum(w, min_covar)[..., None, :], np.swapaxes(v, -1, -2))
+
+def _m_step(X, posteriors, trans_counts, min_covar, feats=None):
+    # Maximum-likelihood updates, so every EM iteration raises the
+    # log-likelihood; min_covar only floors degenerate covariances
+    D = X.shape[-1]
+    if feats is None:
+        feats = _features(X)
+    startprob = posteriors[:, 0]
+    transmat = trans_counts / trans_counts.sum(axis=2, keepdims=True)
+    # Posterior-weighted sums of x_i x_j, x_i and 1 in one product
+    stats = np.matmul(posteriors.transpose(0, 2, 1), feats)             # (B,K,F)
+    n_quad = D * (D + 1) // 2
+    weights = stats[..., -1:]                                            # (B,K,1)
+    means = stats[..., n_quad:n_quad + D] / weights
+    second = np.empty(means.shape + (D,))
+    iu, ju = np.triu_indices(D)
+    second[..., iu, ju] = stats[..., :n_quad] / weights
+    second[..., ju, iu] = second[..., iu, ju]
+    covars = second - means[..., :, None] * means[..., None, :]
+    return startprob, transmat, means, _floor_eigenvalues(covars, min_covar)
+
+def viterbi(X, startprob, transmat, means, covars, log_b=None):
+    """
+    Most likely state path for each sequence; X (B,T,D) -> (B,T) int array.
+    `log_b` are the emission log-densities of these parameters if already
+    computed (e.g. by the last E-step of a fit).
+    """
+    with np.errstate(divide="ignore"):
+        log_start, log_trans = np.log(startprob), np.log(transmat)
+    if log_b is None:
+        log_b = _log_emissions(X, means, covars)
+    B, T, K = log_b.shape
+    delta = log_start + log_b[:, 0]
+    backptr = np.empty((B, T, K), dtype=np.intp)
+    for t in range(1, T):
+        scores = delta[:, :, None] + log_trans                           # (B,K,K)
+        backptr[:, t] = scores.argmax(axis=1)
+        delta = scores.max(axis=1) + log_b[:, t]
+    path = np.empty((B, T), dtype=np.intp)
+    path[:, -1] = delta.argmax(axis=1)
+    rows = np.arange(B)
+    for t in range(T - 1, 0, -1):
+        path[:, t - 1] = backptr[rows, t, path[:, t]]
+    return path
+
+def _kmeans_means(x, n_states, rng, n_iter=20):
+    """k-means++ seeding plus Lloyd iterations for one (T,D) sequence."""
+    centers = [x[rng.integers(len(x))]]
+    for _ in range(1, n_states):
+        d2 = np.min(((x[:, None, :] - np.array(centers)[None]) ** 2).sum(-1), axis=1)
+        centers.append(x[rng.choice(len(x), p=d2 / d2.sum())])
+    centers = np.array(centers)
+    for _ in range(n_iter):
+        labels = ((x[:, None, :] - centers[None]) ** 2).sum(-1).argmin(axis=1)
+        for k in range(n_states):
+            if np.any(labels == k):
+                centers[k] = x[labels == k].mean(axis=0)
+    return centers
+
+def init_params(X, n_states, random_state=42, min_covar=1e-3):
+    """
+    hmmlearn-style initialization for every sequence in X (B,T,D): uniform start
+    and transition probabilities, k-means state means and the pooled covariance
+    plus min_covar on the diagonal.
+    """
+    rng = np.random.default_rng(random_state)
+    B, T, D = X.shape
+    startprob = np.full((B, n_states), 1.0 / n_states)
+    transmat = np.full((B, n_states, n_states), 1.0 / n_states)
+    means = np.stack([_kmeans_means(X[b], n_states, rng) for b in range(B)])
+    cov = np.stack([np.atleast_2d(np.cov(X[b], rowvar=False)) for b in range(B)])
+    covars = np.repeat((cov + min_covar * np.eye(D))[:, None], n_states, axis=1)
+    return startprob, transmat, means, covars
+
+def fit_gaussian_hmm(
+    X,
+    n_states: int = 2,
+    n_iter: int = 200,
+    tol: float = 1e-2,
+    random_state=42,
+    min_covar: float = 1e-3,
+    init=None
+):
+    """
+    Fit full-covariance Gaussian HMMs by EM to one sequence (T,D) or a batch of
+    equal-length sequences (B,T,D) at once.
+
+    Parameters
+    ----------
+    n_iter, tol : maximum EM iterations and log-likelihood improvement per
+        iteration below which a sequence counts as converged (as in hmmlearn).
+    init : optional (startprob, transmat, means, covars) batch to start from
+        instead of the k-means initialization (used for warm starts).
+
+    Returns
+    -------
+    dict with keys:
+        'startprob' (B,K), 'transmat' (B,K,K), 'means' (B,K,D), 'covars' (B,K,D,D),
+        'loglik' (B,), 'n_iter' (B,), 'converged' (B,),
+        'posteriors' (B,T,K) and 'viterbi' (B,T) for the returned parameters.
+    A single (T,D) input gives the same keys without the batch axis.
+    """
+    X = np.asarray(X, dtype="float64")
+    single = X.ndim == 2
+    if single:
+        X = X[None]
+    B = X.shape[0]
+
+    if init is None:
+        params = init_params(X, n_states, random_state=random_state, min_covar=min_covar)
+    else:
+        params = tuple(np.array(p, dtype="float64", copy=True) for p in init)
+    startprob, transmat, means, covars = params
+
+    T, K = X.shape[1], n_states
+    feats = _features(X)
+    loglik = np.empty(B)
+    posteriors = np.empty((B, T, K))
+    log_b = np.empty((B, T, K))
+    prev_ll = np.full(B, -np.inf)
+    iters = np.zeros(B, dtype=int)
+    converged = np.zeros(B, dtype=bool)
+    active = np.arange(B)
+    X_act, feats_act = X, feats
+    for it in range(n_iter + 1):
+        ll, post, trans_counts, lb = _e_step(
+            X_act, startprob[active], transmat[active], means[active], covars[active],
+            feats_act
+        )
+        loglik[active], posteriors[active], log_b[active] = ll, post, lb
+        done = ll - prev_ll[active] < tol
+        converged[active[done]] = True
+        if it == n_iter:
+            break
+        # Converged sequences keep their parameters and leave the batch
+        keep = ~done
+        if not keep.all():
+            active = active[keep]
+            if not len(active):
+                break
+            X_act, feats_act = X_act[keep], feats_act[keep]
+            post, trans_counts = post[keep], trans_counts[keep]
+        new = _m_step(X_act, post, trans_counts, min_covar, feats_act)
+        for old, upd in zip((startprob, transmat, means, covars), new):
+            old[active] = upd
+        prev_ll[active] = ll[keep]
+        iters[active] += 1
+
+    out = {
+        "startprob": startprob,
+        "transmat": transmat,
+        "means": means,
+        "covars": covars,
+        "loglik": loglik,
+        "n_iter": iters,
+        "converged": converged,
+        "posteriors": posteriors,
+        "viterbi": viterbi(X, startprob, transmat, means, covars, log_b=log_b),
+    }
+    if single:
+        out = {k: v[0] for k, v in out.items()}
+    return out
+
+def as_model(fit: dict, index: int = None):
+    """
+    Wrap (one sequence of) a fit_gaussian_hmm result in an object exposing
+    hmmlearn's fitted attribute names (startprob_, transmat_, means_, covars_),
+    so code consuming GaussianHMM parameters can use either engine.
+    """
+    pick = (lambda v: v) if index is None else (lambda v: v[index])
+    return SimpleNamespace(
+        n_components=pick(fit["transmat"]).shape[-1],
+        startprob_=pick(fit["startprob"]),
+        transmat_=pick(fit["transmat"]),
+        means_=pick(fit["means"]),
+        covars_=pick(fit["covars"]),
+        loglik_=float(pick(fit["loglik"])),
+    )
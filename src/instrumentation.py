@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Lightweight tracing for pipeline stages and model fits.
+#
+# A span records wall time, CPU time and memory, plus whatever counters the
+# caller attaches (optimizer iterations, likelihood evaluations, ...).
+# Finished spans are appended to a per-process buffer; a span costs a few
+# clock reads and /proc reads, so tracing stays on.
+#
+# Memory is measured per span on Linux: the RSS when the span starts and the
+# highest RSS while it runs. The kernel's high-water mark (VmHWM) is reset
+# through /proc/self/clear_refs whenever a span starts or ends, and the mark
+# reached since the last reset is credited to every span open at that time,
+# so nested spans each get their own peak (concurrent threads share one
+# process, so their spans see each other's memory). Without /proc (macOS,
+# Windows) or when the reset is not permitted, the span fields are None; the
+# process-wide high-water mark is recorded with every span either way.
+# Work done in another process comes back through call_traced, which returns
+# the worker's spans with its result for the parent to merge.
+
+_EVENTS = []
+_LOCK = threading.Lock()
+
+_RSS_LOCK = threading.Lock()
+_OPEN_PEAKS = {}      # id of an open span -> its highest RSS so far (KiB)
+_PROCESS_PEAK_KB = 0  # high-water marks cleared by resets, so none is lost
+_HWM_RESET = None     # whether /proc/self/clear_refs can reset VmHWM (probed once)
+
+def _status_kb(field: str):
+    """A 'kB' field of /proc/self/status (e.g. VmRSS, VmHWM), or None without /proc."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _reset_hwm():
+    global _HWM_RESET
+    if _HWM_RESET is False:
+        return False
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        _HWM_RESET = True
+    except OSError:
+        _HWM_RESET = False
+    return _HWM_RESET
+
+def _fold_hwm():
+    """Credit the high-water mark since the last reset to all open spans, then reset it."""
+    global _PROCESS_PEAK_KB
+    hwm = _status_kb("VmHWM")
+    if hwm is None:
+        return False
+    _PROCESS_PEAK_KB = max(_PROCESS_PEAK_KB, hwm)
+    for key, peak in _OPEN_PEAKS.items():
+        _OPEN_PEAKS[key] = max(peak, hwm)
+    return _reset_hwm()
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this whole process so far in MB, or None where
+    it cannot be read. Not a per-span figure: see span for that.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1024.0 ** 2 if sys.platform == "darwin" else 1024.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    # Span bookkeeping resets the kernel's mark, which ru_maxrss follows on Linux
+    with _RSS_LOCK:
+        return max(rss, _PROCESS_PEAK_KB / 1024.0)
+
+@contextmanager
+def span(name: str, category: str = "stage", **attrs):
+    """
+    Time a block. Yields a dict the block can add counters to, e.g.
+    info["iterations"] = res.optimization_result.nit.
+
+    The recorded event has 'start_rss_mb' (RSS when the block started) and
+    'peak_rss_mb' (highest RSS while it ran), both None where they cannot be
+    measured, and 'process_peak_rss_mb', the high-water mark of the process.
+    """
+    info = dict(attrs)
+    token = object()
+    with _RSS_LOCK:
+        start_rss = _status_kb("VmRSS")
+        tracked = start_rss is not None and _fold_hwm()
+        if tracked:
+            _OPEN_PEAKS[id(token)] = start_rss
+    start = time.time()
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    try:
+        yield info
+    finally:
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+        peak = None
+        if tracked:
+            with _RSS_LOCK:
+                _fold_hwm()
+                peak = _OPEN_PEAKS.pop(id(token)) / 1024.0
+        event = {
+            "name": name,
+            "cat": category,
+            "start": start,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "start_rss_mb": start_rss / 1024.0 if tracked else None,
+            "peak_rss_mb": peak,
+            "process_peak_rss_mb": peak_rss_mb(),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": info,
+        }
+        with _LOCK:
+            _EVENTS.append(event)
+
+def drain_events():
+    """Remove and return the spans recorded in this process so far."""
+    with _LOCK:
+        events = _EVENTS[:]
+        _EVENTS.clear()
+    return events
+
+def merge_events(events):
+    """Add spans recorded elsewhere (e.g. returned by a worker) to this process."""
+    with _LOCK:
+        _EVENTS.extend(events)
+
+def call_traced(func, args=(), kwargs=None, name: str = None, category: str = "stage"):
+    """
+    Run func(*args, **kwargs) -- inside a span when `name` is given -- and
+    return (result, spans), the spans being everything recorded during the
+    call, nested ones included. Top-level so a worker process can run it;
+    the caller passes the spans to merge_events.
+    """
+    before = drain_events()
+    try:
+        if name is None:
+            result = func(*args, **(kwargs or {}))
+        else:
+            with span(name, category):
+                result = func(*args, **(kwargs or {}))
+        return result, drain_events()
+    finally:
+        # Keep what was already buffered in this process (inline calls)
+        merge_events(before)
+
+def write_trace(events, out_dir: str, basename: str = "trace"):
+    """
+    Write spans as '<basename>.jsonl' (one JSON record per span) and
+    '<basename>.json' in Chrome trace-event format (chrome://tracing, Perfetto).
+    Returns the two paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    events = sorted(events, key=lambda e: e["start"])
+    jsonl_path = os.path.join(out_dir, f"{basename}.jsonl")
+    with open(jsonl_path, "w") as f:
+        for event in events:
+            f.write(json.dumps(event, default=str) + "\n")
+
+    trace_events = [
+        {
+            "name": e["name"],
+            "cat": e["cat"],
+            "ph": "X",
+            "ts": e["start"] * 1e6,
+            "dur": e["wall_s"] * 1e6,
+            "pid": e["pid"],
+            "tid": e["tid"],
+            "args": dict(e["args"], cpu_s=e["cpu_s"], start_rss_mb=e["start_rss_mb"],
+                         peak_rss_mb=e["peak_rss_mb"], process_peak_rss_mb=e["process_peak_rss_mb"]),
+        }
+        for e in events
+    ]
+    chrome_path = os.path.join(out_dir, f"{basename}.json")
+    with open(chrome_path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, default=str)
+    return jsonl_path, chrome_path
@@ -0,0 +1,239 @@
+import os
+import numpy as np
+import pandas as pd
+from instrumentation import span
+
+# Daily realized measures from intraday bars (1-minute, 5-minute, ...).
+#
+# Bars are read in fixed-size chunks, so memory is bounded by the chunk size
+# and not by the length of the history. A chunk only finalizes the days it
+# holds completely; the bars of its last (possibly unfinished) day are carried
+# into the next chunk. RV, BV and RK use intraday returns only; the return
+# from one day's last bar to the next day's first bar is kept separately as
+# the overnight measure, and intraday_realized_vol adds it back so the daily
+# target covers the same close-to-close span as daily-return forecasts.
+
+PARZEN_C = ((12.0 ** 2) / 0.269) ** 0.2  # c* of the Parzen kernel, ~3.5134
+BAR_EXTENSIONS = (".parquet", ".csv")
+
+def parzen_weight(x):
+    """Parzen kernel k(x) for x >= 0 (zero beyond 1)."""
+    x = np.asarray(x, dtype="float64")
+    return np.where(
+        x <= 0.5, 1.0 - 6.0 * x * x + 6.0 * x ** 3,
+        np.where(x <= 1.0, 2.0 * (1.0 - x) ** 3, 0.0)
+    )
+
+def find_bars_file(bars_dir: str, ticker: str):
+    """Path of '<bars_dir>/<ticker>.parquet' (or .csv), or None if there is none."""
+    if bars_dir is None:
+        return None
+    for ext in BAR_EXTENSIONS:
+        path = os.path.join(bars_dir, f"{ticker.replace(os.sep, '_')}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def bars_file_info(path: str):
+    """Size and modification time of a bars file, so stages can tell when it changed."""
+    st = os.stat(path)
+    return {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def _parse_timestamps(values: pd.Series):
+    """
+    Timestamps of a CSV column. Values with UTC offsets are parsed as UTC
+    instants, since the offset of a local zone changes across DST and pandas
+    cannot hold mixed offsets in one index; naive values stay naive.
+    """
+    aware = len(values) > 0 and pd.Timestamp(values.iloc[0]).tz is not None
+    return pd.DatetimeIndex(pd.to_datetime(values, utc=aware))
+
+def iter_bar_chunks(path: str, chunk_rows: int = 1_000_000,
+                    time_col: str = "timestamp", price_col: str = "close", tz=None):
+    """
+    Stream (timestamps, prices) chunks of at most `chunk_rows` bars from a
+    Parquet or CSV file, in file order. Time-zone-aware timestamps (including
+    CSV values with UTC offsets) are converted to `tz` if given; naive ones
+    are left naive.
+    """
+    def localize(timestamps):
+        return timestamps.tz_convert(tz) if tz is not None and timestamps.tz is not None else timestamps
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        # With pre-buffering, the buffers of every row group read so far
+        # stay alive until the file is closed, so memory would grow with the file
+        batches = pq.ParquetFile(path, pre_buffer=False).iter_batches(
+            batch_size=chunk_rows, columns=[time_col, price_col]
+        )
+        for batch in batches:
+            df = batch.to_pandas()
+            yield localize(pd.DatetimeIndex(df[time_col])), df[price_col].to_numpy(dtype="float64")
+    else:
+        for df in pd.read_csv(path, usecols=[time_col, price_col], chunksize=chunk_rows):
+            yield localize(_parse_timestamps(df[time_col])), df[price_col].to_numpy(dtype="float64")
+
+def _day_numbers(timestamps: pd.DatetimeIndex, tz=None):
+    """Calendar day of every bar as days since the epoch (in `tz` if given)."""
+    if tz is not None:
+        timestamps = timestamps.tz_convert(tz) if timestamps.tz is not None else timestamps.tz_localize(tz)
+    if timestamps.tz is not None:
+        timestamps = timestamps.tz_localize(None)
+    return timestamps.to_numpy().astype("datetime64[D]").view("int64")
+
+def _same_day_products(r, rd, idx, lag, n_days):
+    """Per-day sum of r_i * r_{i-lag} over pairs within one day."""
+    same = rd[lag:] == rd[:-lag]
+    return np.bincount(idx[lag:][same], weights=(r[lag:] * r[:-lag])[same], minlength=n_days)
+
+def _day_measures(days, logp, bandwidth=None, sparse_step: int = 20, prev_logp=np.nan):
+    """
+    Realized measures of the complete days in (days, logp), both sorted by time.
+    `prev_logp` is the log price of the last bar before them (NaN if none).
+
+    RV is the sum of squared intraday returns, BV the bipower variation
+    (pi/2) * n/(n-1) * sum |r_i||r_{i-1}|, and RK the Parzen realized kernel
+    gamma_0 + 2 * sum_{h=1..H} k(h / (H+1)) gamma_h of Barndorff-Nielsen et al.
+    (2009). Unless `bandwidth` fixes H, each day gets H = c* xi^(4/5) n^(3/5),
+    with the noise ratio xi^2 = omega^2 / IV estimated from omega^2 = RV / 2n
+    and IV = the RV of every `sparse_step`-th bar. The overnight measure is the
+    squared log return from the previous day's last bar to the day's first bar.
+    """
+    r = np.diff(logp)
+    same = days[1:] == days[:-1]
+    r, rd = r[same], days[1:][same]
+    if not len(r):
+        return None
+    new_day = np.r_[True, rd[1:] != rd[:-1]]
+    idx = np.cumsum(new_day) - 1
+    uday = rd[new_day]
+    D = len(uday)
+
+    first = np.r_[0, np.flatnonzero(days[1:] != days[:-1]) + 1]
+    gap = logp[first] - np.r_[prev_logp, logp[first[1:] - 1]]
+    overnight = (gap * gap)[np.searchsorted(days[first], uday)]
+
+    n = np.bincount(idx, minlength=D)
+    rv = np.bincount(idx, weights=r * r, minlength=D)
+    abs_r = np.abs(r)
+    pair = rd[1:] == rd[:-1]
+    bv_sum = np.bincount(idx[1:][pair], weights=(abs_r[1:] * abs_r[:-1])[pair], minlength=D)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bv = np.where(n > 1, 0.5 * np.pi * n / (n - 1) * bv_sum, np.nan)
+
+    if bandwidth is None:
+        # Sparse RV from every sparse_step-th bar of each day (bar positions
+        # counted from the day's first bar)
+        pos = np.arange(len(days)) - np.repeat(first, np.diff(np.r_[first, len(days)]))
+        on_grid = pos % sparse_step == 0
+        sd, sp = days[on_grid], logp[on_grid]
+        keep = sd[1:] == sd[:-1]
+        rs, rsd = np.diff(sp)[keep], sd[1:][keep]
+        rv_sparse = np.bincount(np.searchsorted(uday, rsd), weights=rs * rs, minlength=D)
+        iv = np.where(rv_sparse > 0, rv_sparse, rv)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xi2 = np.where(iv > 0, rv / (2.0 * n) / iv, 0.0)
+        H = np.ceil(PARZEN_C * xi2 ** 0.4 * n ** 0.6).astype(np.int64)
+        H = np.clip(H, 1, np.maximum(n - 1, 1))
+    else:
+        H = np.full(D, int(bandwidth), dtype=np.int64)
+
+    rk = rv.copy()
+    for h in range(1, int(H.max()) + 1):
+        gamma = _same_day_products(r, rd, idx, h, D)
+        rk += 2.0 * parzen_weight(h / (H + 1.0)) * gamma
+
+    return pd.DataFrame(
+        {"n_returns": n, "rv": rv, "bv": bv, "rk": rk, "overnight": overnight, "bandwidth": H},
+        index=pd.DatetimeIndex(uday.astype("datetime64[D]").astype("datetime64[ns]"), name="date"),
+    )
+
+def daily_realized_measures(
+    path: str,
+    chunk_rows: int = 1_000_000,
+    time_col: str = "timestamp",
+    price_col: str = "close",
+    tz=None,
+    bandwidth: int = None,
+    sparse_step: int = 20
+):
+    """
+    Daily realized variance, bipower variation and Parzen realized kernel from
+    a file of intraday bars, streamed `chunk_rows` bars at a time.
+
+    Parameters
+    ----------
+    path : str
+        Parquet or CSV file with a timestamp column and a price column, sorted
+        by time (e.g. '<bars_dir>/<ticker>.parquet', see find_bars_file).
+    chunk_rows : int
+        Bars read per chunk; bounds the memory use.
+    tz : str, optional
+        Time zone whose calendar days define the trading day, e.g.
+        "America/New_York"; naive timestamps are taken to be in it.
+    bandwidth : int, optional
+        Fixed realized-kernel bandwidth H for every day; None picks H per day.
+    sparse_step : int
+        Bar spacing of the sparse RV used to pick H (20 bars of 1 minute).
+
+    Returns
+    -------
+    pd.DataFrame indexed by date with columns
+        'n_returns' : intraday returns of the day
+        'rv', 'bv', 'rk' : realized variance, bipower variation, realized kernel
+                           (squared log returns, fractions)
+        'overnight' : squared log return from the previous day's last bar to
+                      the day's first bar (NaN on the first day of the file)
+        'bandwidth' : kernel bandwidth H used for the day
+    Days with fewer than two bars are left out (their last bar still starts
+    the next day's overnight return).
+    """
+    frames = []
+    carry_days = np.empty(0, dtype=np.int64)
+    carry_logp = np.empty(0)
+    prev_logp = np.nan
+    with span(os.path.basename(path), "intraday", chunk_rows=chunk_rows) as info:
+        n_bars = 0
+        for timestamps, prices in iter_bar_chunks(path, chunk_rows, time_col, price_col, tz):
+            n_bars += len(prices)
+            days = np.concatenate([carry_days, _day_numbers(timestamps, tz)])
+            logp = np.concatenate([carry_logp, np.log(prices)])
+            if np.any(days[1:] < days[:-1]):
+                raise ValueError(f"bars in {path} are not sorted by time")
+            # Days before the chunk's last day are complete
+            cut = int(np.searchsorted(days, days[-1]))
+            if cut:
+                frames.append(_day_measures(days[:cut], logp[:cut], bandwidth, sparse_step, prev_logp))
+                prev_logp = logp[cut - 1]
+            carry_days, carry_logp = days[cut:], logp[cut:]
+        if len(carry_days):
+            frames.append(_day_measures(carry_days, carry_logp, bandwidth, sparse_step, prev_logp))
+        info["bars"] = n_bars
+
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        return pd.DataFrame(
+            columns=["n_returns", "rv", "bv", "rk", "overnight", "bandwidth"],
+            index=pd.DatetimeIndex([], name="date")
+        )
+    return pd.concat(frames)
+
+def intraday_realized_vol(measures: pd.DataFrame, measure: str = "rk", overnight: bool = True):
+    """
+    Daily realized volatility (fraction) from daily_realized_measures, ready
+    to be the realized target of evaluate_forecasts or forecast_losses.
+
+    With `overnight`, the squared overnight return is added to the intraday
+    measure, so the target spans close to close like the daily returns the
+    GARCH forecasts are fitted on (NaN on the first day, which has no previous
+    close). Without it the target covers trading hours only and understates
+    close-to-close volatility.
+    """
+    if measure not in ("rv", "bv", "rk"):
+        raise ValueError(f"measure must be 'rv', 'bv' or 'rk', got {measure!r}")
+    # The kernel is non-negative in theory; clip rounding noise
+    variance = measures[measure].clip(lower=0.0)
+    if overnight:
+        variance = variance + measures["overnight"]
+    return np.sqrt(variance).rename("realized_vol")
@@ -9,61 +9,171 @@ Usage:
 2. python src/main.py
 
 Pipeline:
-- Downloads SPY & BTC data from Yahoo Finance (2015–today)
+- Downloads SPY & BTC data from Yahoo Finance (2015–today),
+  topping up a local Parquet price cache instead of refetching history
 - Computes log returns
-- Fits GARCH, EGARCH, GJR-GARCH models
+- Fits GARCH, EGARCH, GJR-GARCH models (--garch-dists / --garch-means fit
+  the grid over innovation distributions and mean models, ranked by BIC)
 - Fits Hidden Markov Model (HMM) for regime detection
 - Plots conditional vs realized vol & regime heatmaps
 - Evaluates 1-day-ahead volatility forecasts
+
+The stages run as a dependency graph (see dag.py and pipeline.pipeline_stages):
+independent stages run in parallel worker processes (--workers sets the pool
+size) and each stage's output is stored under data/artifacts, so a rerun only
+recomputes stages whose data or settings changed. GARCH and HMM fits are also
+cached under data/fit_cache (--no-cache recomputes everything). Every stage
+and model fit is traced (wall/CPU time, optimizer iterations, its own peak memory) to
+results/trace.jsonl and results/trace.json (chrome://tracing / Perfetto).
+An asset with intraday bars in data/bars/<ticker>.parquet (or .csv; columns
+timestamp, close) is evaluated against the daily realized kernel of those
+bars instead of the rolling daily realized volatility (see intraday.py).
+--no-figures runs headless and saves only numbers; --render draws the figures
+from those saved results afterwards. --show prints the forecast metrics of
+the last run without importing pandas or any model library, so it starts
+almost instantly (benchmarks/import_budget.py checks this).
 """
 
 import os
-import pandas as pd
-from data_loader import load_data
-from garch_model import fit_garch_models
-from regime_switching import fit_hmm_regimes
-from diagnostics import realized_volatility, evaluate_forecasts
-from visualization import plot_conditional_vol_vs_realized
+import argparse
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+PRICE_CACHE_DIR = os.path.join(DATA_DIR, "price_cache")
+FIT_CACHE_DIR = os.path.join(DATA_DIR, "fit_cache")
+ARTIFACT_DIR = os.path.join(DATA_DIR, "artifacts")
+BARS_DIR = os.path.join(DATA_DIR, "bars")
 RESULTS_DIR = os.path.join(BASE_DIR, "results")
 FIGS_DIR = os.path.join(RESULTS_DIR, "figures")
 
-def main():
-    # 1️⃣ Load and prepare data
-    spy_ret, btc_ret, both = load_data(output_dir=DATA_DIR)
+# Asset label -> ticker
+ASSETS = {"SPY": "SPY", "BTC": "BTC-USD"}
+
+def render():
+    """Draw all figures from the artifacts of a previous (e.g. --no-figures) run."""
+    from visualization import render_figures
 
-    # 2️⃣ Fit GARCH-family models
-    spy_models, spy_fc, spy_cond_vol = fit_garch_models(spy_ret["log_ret"], "SPY", results_dir=RESULTS_DIR, figs_dir=FIGS_DIR)
-    btc_models, btc_fc, btc_cond_vol = fit_garch_models(btc_ret["log_ret"], "BTC", results_dir=RESULTS_DIR, figs_dir=FIGS_DIR)
+    for asset_name in ASSETS:
+        written = render_figures(asset_name, results_dir=RESULTS_DIR, figs_dir=FIGS_DIR)
+        print(f"{asset_name}: rendered {len(written)} figures")
+    print(f"Figures saved to: {FIGS_DIR}")
 
-    # 3️⃣ Realized volatility (5-day rolling)
-    spy_rv = realized_volatility(spy_ret["log_ret"])
-    btc_rv = realized_volatility(btc_ret["log_ret"])
+def show(path: str = os.path.join(RESULTS_DIR, "forecasts.csv")):
+    """Print the forecast metrics saved by the last run (stdlib csv only)."""
+    import csv
 
-    # 4️⃣ Plot conditional vs realized volatility
-    plot_conditional_vol_vs_realized("SPY", spy_cond_vol, spy_rv, figs_dir=FIGS_DIR)
-    plot_conditional_vol_vs_realized("BTC", btc_cond_vol, btc_rv, figs_dir=FIGS_DIR)
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    print(f"{'asset':<8}{'model':<26}{'abs_err':>10}{'rmse':>10}")
+    for row in rows:
+        print(f"{row['asset']:<8}{row['model']:<26}"
+              f"{float(row['abs_err']):>10.4f}{float(row['rmse']):>10.4f}")
 
-    # 5️⃣ Regime switching (Hidden Markov Model)
-    spy_hmm = fit_hmm_regimes(spy_ret["log_ret"], n_states=2, asset_name="SPY", results_dir=RESULTS_DIR, figs_dir=FIGS_DIR)
-    btc_hmm = fit_hmm_regimes(btc_ret["log_ret"], n_states=2, asset_name="BTC", results_dir=RESULTS_DIR, figs_dir=FIGS_DIR)
+def main(
+    workers: int = None,
+    n_states=2,
+    garch_jobs: int = 1,
+    garch_dists=None,
+    garch_means=None,
+    hmm_restarts: int = 1,
+    hmm_jobs: int = 1,
+    make_figures: bool = True,
+    use_cache: bool = True
+):
+    # Heavy imports (pandas and the model libraries behind them) stay out of
+    # module import so --show and --help start fast
+    from pipeline import pipeline_stages
+    from dag import run_dag
+    from instrumentation import drain_events, write_trace
+    from garch_model import garch_spec_grid, GARCH_DISTS, GARCH_MEANS
 
-    # 6️⃣ Evaluate volatility forecast accuracy
-    spy_eval = evaluate_forecasts([spy_fc], spy_rv, "SPY", results_dir=RESULTS_DIR, figs_dir=FIGS_DIR)
-    btc_eval = evaluate_forecasts([btc_fc], btc_rv, "BTC", results_dir=RESULTS_DIR, figs_dir=FIGS_DIR)
+    # Default GARCH/EGARCH/GJR-GARCH set, or the grid over the requested
+    # distributions and mean models
+    garch_specs = None
+    if garch_dists or garch_means:
+        garch_specs = garch_spec_grid(dists=garch_dists or GARCH_DISTS,
+                                      means=garch_means or GARCH_MEANS)
 
-    # 7️⃣ Save combined summary
-    forecasts_path = os.path.join(RESULTS_DIR, "forecasts.csv")
-    pd.concat([
-        spy_eval.assign(asset="SPY"),
-        btc_eval.assign(asset="BTC")
-    ]).to_csv(forecasts_path, index=False)
+    # 1️⃣–7️⃣ Data, GARCH, realized vol, plots, HMM, evaluation and summary as a
+    # stage graph: unchanged stages come from the artifact store and
+    # independent branches run concurrently
+    stages = pipeline_stages(
+        ASSETS, DATA_DIR, price_cache_dir=PRICE_CACHE_DIR, n_states=n_states,
+        garch_jobs=garch_jobs, garch_specs=garch_specs,
+        hmm_restarts=hmm_restarts, hmm_jobs=hmm_jobs, cache_dir=FIT_CACHE_DIR if use_cache else None, bars_dir=BARS_DIR,
+        make_figures=make_figures, results_dir=RESULTS_DIR, figs_dir=FIGS_DIR
+    )
+    _, status = run_dag(
+        stages, ARTIFACT_DIR,
+        max_workers=workers if workers is not None else os.cpu_count(),
+        refresh=not use_cache
+    )
+    reused = sum(state == "cached" for state in status.values())
+
+    # 8️⃣ Timing/memory trace of every stage and model fit, next to forecasts.csv
+    trace_paths = write_trace(drain_events(), RESULTS_DIR)
 
     print("✅ Pipeline complete.")
-    print(f"Figures saved to: {FIGS_DIR}")
-    print(f"Forecast metrics saved to: {forecasts_path}")
+    print(f"Stages: {len(status) - reused} run, {reused} reused from {ARTIFACT_DIR}")
+    if make_figures:
+        print(f"Figures saved to: {FIGS_DIR}")
+    print(f"Forecast metrics saved to: {os.path.join(RESULTS_DIR, 'forecasts.csv')}")
+    print(f"Stage trace saved to: {trace_paths[0]} (Chrome trace: {trace_paths[1]})")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="worker processes for the pipeline stages (default: CPU count)"
+    )
+    parser.add_argument(
+        "--garch-jobs", type=int, default=1,
+        help="processes used to fit the GARCH specs of one asset concurrently"
+    )
+    parser.add_argument(
+        "--garch-dists", nargs="+", default=None,
+        help="fit every GARCH process under these innovation distributions, e.g. normal t skewt"
+    )
+    parser.add_argument(
+        "--garch-means", nargs="+", default=None,
+        help="mean models of the GARCH grid, e.g. Constant Zero (default: Constant)"
+    )
+    parser.add_argument(
+        "--n-states", type=int, nargs="+", default=[2],
+        help="HMM state count, or several candidates to choose from by BIC"
+    )
+    parser.add_argument(
+        "--hmm-restarts", type=int, default=1,
+        help="EM initializations per HMM fit; the best log-likelihood is kept"
+    )
+    parser.add_argument(
+        "--hmm-jobs", type=int, default=1,
+        help="processes used to run the HMM restarts of one asset concurrently"
+    )
+    parser.add_argument(
+        "--no-figures", action="store_true",
+        help="headless run: save numbers only, never import pyplot"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="refit every model instead of reusing fits of unchanged data"
+    )
+    parser.add_argument(
+        "--render", action="store_true",
+        help="only draw figures from the results of a previous run"
+    )
+    parser.add_argument(
+        "--show", action="store_true",
+        help="only print the forecast metrics of a previous run"
+    )
+    args = parser.parse_args()
+    if args.show:
+        show()
+    elif args.render:
+        render()
+    else:
+        n_states = args.n_states[0] if len(args.n_states) == 1 else args.n_states
+        main(workers=args.workers, n_states=n_states, garch_jobs=args.garch_jobs,
+             garch_dists=args.garch_dists, garch_means=args.garch_means,
+             hmm_restarts=args.hmm_restarts, hmm_jobs=args.hmm_jobs,
+             make_figures=not args.no_figures, use_cache=not args.no_cache)
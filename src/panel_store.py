@@ -0,0 +1,78 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+VALUES_FILE = "returns.npy"
+DATES_FILE = "dates.npy"
+TICKERS_FILE = "tickers.json"
+
+def save_returns_panel(panel: pd.DataFrame, store_dir: str, dtype: str = "float64"):
+    """
+    Save a (date x ticker) returns panel as a binary store:
+        returns.npy  : value matrix, column-major so each ticker is contiguous
+        dates.npy    : datetime64[ns] index
+        tickers.json : column labels and dtype
+
+    Parameters
+    ----------
+    panel : pd.DataFrame
+        Returns panel, e.g. from data_loader.load_universe (NaN allowed).
+    store_dir : str
+        Folder to write the store into (created if needed).
+    dtype : {"float64", "float32"}
+        Storage precision of the value matrix.
+    """
+    if dtype not in ("float64", "float32"):
+        raise ValueError(f"dtype must be 'float64' or 'float32', got {dtype!r}")
+    os.makedirs(store_dir, exist_ok=True)
+
+    values = np.asfortranarray(panel.to_numpy(dtype=dtype))
+    dates = pd.DatetimeIndex(panel.index).values.astype("datetime64[ns]")
+
+    np.save(os.path.join(store_dir, VALUES_FILE), values)
+    np.save(os.path.join(store_dir, DATES_FILE), dates)
+    with open(os.path.join(store_dir, TICKERS_FILE), "w") as f:
+        json.dump({"tickers": [str(c) for c in panel.columns], "dtype": dtype}, f)
+
+def open_returns_panel(store_dir: str, mmap_mode: str = "r"):
+    """
+    Open a returns panel store without parsing or copying the value matrix.
+    The returned DataFrame is backed by a read-only memory map, so several
+    worker processes can open the same store and share the OS page cache.
+    """
+    values = np.load(os.path.join(store_dir, VALUES_FILE), mmap_mode=mmap_mode)
+    dates = pd.DatetimeIndex(np.load(os.path.join(store_dir, DATES_FILE)), name="date")
+    with open(os.path.join(store_dir, TICKERS_FILE)) as f:
+        tickers = json.load(f)["tickers"]
+    return pd.DataFrame(values, index=dates, columns=tickers, copy=False)
+
+def load_panel_column(store_dir: str, ticker: str, dropna: bool = True):
+    """
+    Read one ticker's return series from a panel store.
+    Only that ticker's (contiguous) column is paged in from disk, which makes
+    this the cheap way for a worker process to get its asset: pass the store
+    path and ticker instead of pickling a DataFrame.
+    """
+    with open(os.path.join(store_dir, TICKERS_FILE)) as f:
+        tickers = json.load(f)["tickers"]
+    values = np.load(os.path.join(store_dir, VALUES_FILE), mmap_mode="r")
+    dates = pd.DatetimeIndex(np.load(os.path.join(store_dir, DATES_FILE)), name="date")
+    series = pd.Series(values[:, tickers.index(ticker)], index=dates, name=ticker, copy=False)
+    return series.dropna() if dropna else series
+
+def panel_column_ref(store_dir: str, ticker: str):
+    """
+    Small, picklable reference to one ticker's column of a panel store: the
+    store path, the ticker and a SHA-256 of its dates and values. Pass it to
+    worker processes instead of the series (they read it with
+    load_panel_column); the digest changes whenever the data does.
+    """
+    with open(os.path.join(store_dir, TICKERS_FILE)) as f:
+        tickers = json.load(f)["tickers"]
+    values = np.load(os.path.join(store_dir, VALUES_FILE), mmap_mode="r")
+    h = hashlib.sha256()
+    h.update(np.load(os.path.join(store_dir, DATES_FILE)).tobytes())
+    h.update(np.ascontiguousarray(values[:, tickers.index(ticker)]).tobytes())
+    return {"store_dir": store_dir, "ticker": ticker, "digest": h.hexdigest()}
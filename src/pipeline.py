@@ -0,0 +1,223 @@
+import os
+import pandas as pd
+from panel_store import load_panel_column, panel_column_ref
+from garch_model import fit_garch_models, forecast_horizons, FORECAST_HORIZONS, DEFAULT_GARCH_SPECS
+from regime_switching import fit_hmm_regimes
+from diagnostics import realized_volatility, evaluate_forecasts, RV_WINDOW
+from data_loader import load_data
+from intraday import find_bars_file, bars_file_info, daily_realized_measures, intraday_realized_vol
+from dag import stage
+from instrumentation import span
+
+# Stage functions of the pipeline_stages graph: each per-asset step as a
+# top-level function of its inputs. Per-asset stages receive a reference to
+# the asset's column of the returns panel store (see panel_column_ref) and
+# read the series themselves, so no DataFrame is pickled into worker processes.
+
+def _load_returns(returns_ref: dict):
+    return load_panel_column(returns_ref["store_dir"], returns_ref["ticker"])
+
+def data_stage(output_dir: str, cache_dir: str = None):
+    """Download/update prices and write the returns panel store; returns its path."""
+    load_data(output_dir=output_dir, cache_dir=cache_dir)
+    return os.path.join(output_dir, "returns_panel")
+
+def garch_stage(
+    returns_ref: dict,
+    asset_name: str,
+    garch_jobs: int = 1,
+    garch_specs=None,
+    horizons=FORECAST_HORIZONS,
+    cache_dir: str = None,
+    make_figures: bool = True,
+    results_dir: str = "../results",
+    figs_dir: str = "../results/figures"
+):
+    """GARCH fits (ranked by BIC) plus one-day and multi-horizon forecasts for one asset."""
+    models, forecasts, cond_vol = fit_garch_models(
+        _load_returns(returns_ref), asset_name, results_dir=results_dir, figs_dir=figs_dir, specs=garch_specs,
+        n_jobs=garch_jobs, make_figures=make_figures, cache_dir=cache_dir
+    )
+    horizon_forecasts = forecast_horizons(models, asset_name, horizons=horizons)
+    horizon_forecasts.to_csv(
+        os.path.join(results_dir, f"{asset_name}_forecast_horizons.csv"), index=False
+    )
+    return {"forecasts": forecasts, "horizon_forecasts": horizon_forecasts, "cond_vol": cond_vol}
+
+def realized_vol_stage(returns_ref: dict, asset_name: str, results_dir: str = "../results"):
+    """Rolling realized volatility, saved as '<asset>_realized_vol.csv'."""
+    os.makedirs(results_dir, exist_ok=True)
+    rv = realized_volatility(_load_returns(returns_ref), window=RV_WINDOW)
+    rv.to_frame(name="realized_vol").to_csv(
+        os.path.join(results_dir, f"{asset_name}_realized_vol.csv"), index_label="date"
+    )
+    return rv
+
+def intraday_vol_stage(
+    bars: dict,
+    asset_name: str,
+    measure: str = "rk",
+    overnight: bool = True,
+    tz=None,
+    results_dir: str = "../results"
+):
+    """
+    Daily realized volatility from intraday bars (see intraday.py), used in
+    place of realized_vol_stage when the asset has a bars file. The squared
+    overnight return is added to the intraday measure unless `overnight` is
+    False, so the target spans close to close like the GARCH forecasts. Saves
+    the measures as '<asset>_intraday_measures.csv' and the target as
+    '<asset>_realized_vol.csv'.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    measures = daily_realized_measures(bars["path"], tz=tz)
+    measures.to_csv(
+        os.path.join(results_dir, f"{asset_name}_intraday_measures.csv"), index_label="date"
+    )
+    rv = intraday_realized_vol(measures, measure, overnight=overnight)
+    rv.to_frame(name="realized_vol").to_csv(
+        os.path.join(results_dir, f"{asset_name}_realized_vol.csv"), index_label="date"
+    )
+    return rv
+
+def hmm_stage(returns_ref: dict, **kwargs):
+    """HMM regime detection for one asset (keyword arguments as in fit_hmm_regimes)."""
+    return fit_hmm_regimes(_load_returns(returns_ref), **kwargs)
+
+def cond_vol_plot_stage(garch: dict, rv: pd.Series, asset_name: str, figs_dir: str = "../results/figures"):
+    """Conditional vs realized volatility figure."""
+    from visualization import plot_conditional_vol_vs_realized
+    with span(f"{asset_name} cond. vs realized figure", "plot"):
+        plot_conditional_vol_vs_realized(asset_name, garch["cond_vol"], rv, figs_dir=figs_dir)
+
+def evaluation_stage(
+    garch: dict,
+    rv: pd.Series,
+    asset_name: str,
+    realized_window: int = 1,
+    make_figures: bool = True,
+    results_dir: str = "../results",
+    figs_dir: str = "../results/figures"
+):
+    """
+    Scores the GARCH conditional volatility series against realized volatility
+    for one asset; returns {"summary": metrics table, "losses": per-date losses}.
+    """
+    summary, losses = evaluate_forecasts(
+        pd.DataFrame(garch["cond_vol"]), rv, asset_name, realized_window=realized_window,
+        results_dir=results_dir, figs_dir=figs_dir, make_figures=make_figures
+    )
+    return {"summary": summary, "losses": losses}
+
+def summary_stage(*evaluations, asset_names, path: str):
+    """Combined evaluation table of all assets, written to `path`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    summary = pd.concat([ev["summary"].assign(asset=name) for name, ev in zip(asset_names, evaluations)])
+    summary.to_csv(path, index=False)
+    return summary
+
+def pipeline_stages(
+    assets: dict,
+    data_dir: str,
+    price_cache_dir: str = None,
+    n_states=2,
+    garch_jobs: int = 1,
+    garch_specs=None,
+    hmm_restarts: int = 1,
+    hmm_jobs: int = 1,
+    horizons=FORECAST_HORIZONS,
+    cache_dir: str = None,
+    bars_dir: str = None,
+    realized_measure: str = "rk",
+    make_figures: bool = True,
+    results_dir: str = "../results",
+    figs_dir: str = "../results/figures"
+):
+    """
+    The full pipeline as a stage graph for dag.run_dag:
+
+        data -> <asset>/returns -> <asset>/garch ----> <asset>/eval -> summary
+                                -> <asset>/realized_vol -^
+                                -> <asset>/hmm
+
+    plus '<asset>/cond_vol_plot' when drawing figures. Loading data and reading
+    the returns always run (they are cheap and fetch new prices); every later
+    stage is recomputed only when its returns or its own settings change, so
+    e.g. changing an HMM setting reruns just the HMM stages. `garch_jobs`,
+    `hmm_jobs` and `cache_dir` do not change any result, so they are passed as
+    execution settings outside the stage keys and changing them reruns nothing.
+    Every stage
+    declares the files it writes (CSVs, figures), so a stage whose files were
+    deleted, or overwritten by a run with other settings, runs again even if
+    its artifact is stored.
+
+    '<asset>/eval' scores every model's conditional volatility series against
+    the realized target date by date; its artifact holds the per-date losses
+    for forecast_tests.compare_forecasts next to the metrics table.
+
+    An asset with intraday bars in `bars_dir` ('<ticker>.parquet' or '.csv')
+    gets '<asset>/bars -> <asset>/realized_vol' instead: the realized target
+    is the daily `realized_measure` ("rv", "bv" or "rk") of its bars plus the
+    squared overnight return (last bar to next first bar), so it spans close to
+    close like the daily returns the GARCH models forecast. The bars stage only
+    stats the file, so the measures are recomputed when it changes.
+    """
+    garch_names = [spec["name"] for spec in (garch_specs or DEFAULT_GARCH_SPECS)]
+
+    def results(*names):
+        return [os.path.join(results_dir, name) for name in names]
+
+    def figures(*names):
+        return [os.path.join(figs_dir, name) for name in names] if make_figures else []
+
+    stages = [stage("data", data_stage, volatile=True, output_dir=data_dir, cache_dir=price_cache_dir)]
+    for asset_name, ticker in assets.items():
+        returns, garch, rv = f"{asset_name}/returns", f"{asset_name}/garch", f"{asset_name}/realized_vol"
+        a = asset_name
+        hmm_outputs = results(f"{a}_regimes.csv", f"{a}_transition_matrix.csv")
+        if not isinstance(n_states, int):
+            hmm_outputs += results(f"{a}_n_states_selection.csv")
+        stages += [
+            stage(returns, panel_column_ref, ["data"], volatile=True, ticker=ticker),
+            stage(garch, garch_stage, [returns],
+                  outputs=results(f"{a}_cond_vol.csv", f"{a}_std_resid.csv",
+                                  f"{a}_garch_ranking.csv", f"{a}_forecast_horizons.csv")
+                  + figures(*[f"{a}_{m}_{kind}.png" for m in garch_names for kind in ("volatility", "qqplot")]),
+                  exec_params={"garch_jobs": garch_jobs, "cache_dir": cache_dir},
+                  asset_name=asset_name, garch_specs=garch_specs, horizons=horizons,
+                  make_figures=make_figures, results_dir=results_dir, figs_dir=figs_dir),
+            stage(f"{asset_name}/hmm", hmm_stage, [returns],
+                  outputs=hmm_outputs + figures(f"{a}_regime_probs.png", f"{a}_regime_scatter.png",
+                                                f"{a}_transition_matrix.png"),
+                  exec_params={"n_jobs": hmm_jobs, "cache_dir": cache_dir},
+                  n_states=n_states, asset_name=asset_name, results_dir=results_dir,
+                  figs_dir=figs_dir, make_figures=make_figures, n_restarts=hmm_restarts),
+        ]
+        bars_path = find_bars_file(bars_dir, ticker)
+        if bars_path is None:
+            stages.append(stage(rv, realized_vol_stage, [returns], outputs=results(f"{a}_realized_vol.csv"),
+                                asset_name=asset_name, results_dir=results_dir))
+            realized_window = RV_WINDOW
+        else:
+            stages += [
+                stage(f"{asset_name}/bars", bars_file_info, volatile=True, path=bars_path),
+                stage(rv, intraday_vol_stage, [f"{asset_name}/bars"],
+                      outputs=results(f"{a}_intraday_measures.csv", f"{a}_realized_vol.csv"),
+                      asset_name=asset_name, measure=realized_measure, results_dir=results_dir),
+            ]
+            realized_window = 1
+        stages.append(stage(f"{asset_name}/eval", evaluation_stage, [garch, rv],
+                            outputs=results(f"{a}_forecast_eval.csv", f"{a}_forecast_losses.csv")
+                            + figures(f"{a}_forecast_rmse.png"),
+                            asset_name=asset_name, realized_window=realized_window,
+                            make_figures=make_figures, results_dir=results_dir, figs_dir=figs_dir))
+        if make_figures:
+            stages.append(stage(f"{asset_name}/cond_vol_plot", cond_vol_plot_stage, [garch, rv],
+                                outputs=figures(f"{a}_cond_vs_realized.png"),
+                                asset_name=asset_name, figs_dir=figs_dir))
+    summary_path = os.path.join(results_dir, "forecasts.csv")
+    stages.append(stage(
+        "summary", summary_stage, [f"{name}/eval" for name in assets], outputs=[summary_path],
+        asset_names=list(assets), path=summary_path
+    ))
+    return stages
@@ -0,0 +1,117 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+
+def init_regime_filter(hmm_result: dict, lag: int = 0):
+    """
+    Build a streaming regime filter from the output of fit_hmm_regimes.
+
+    The HMM parameters and the StandardScaler state are frozen. The filter
+    starts from the posterior at the last fitted date (at the end of the sample
+    the smoothed and filtered probabilities coincide), so live updates continue
+    from there without replaying the history.
+
+    Parameters
+    ----------
+    hmm_result : dict
+        Output of fit_hmm_regimes (needs 'model', 'scaler', 'posterior_probs').
+    lag : int
+        Fixed lag L for smoothed probabilities p(s_{t-L} | y_1..y_t); 0 disables
+        smoothing.
+
+    Returns
+    -------
+    dict holding the frozen parameters and the running filter state.
+    """
+    model = hmm_result["model"]
+    scaler = hmm_result["scaler"]
+    covars = np.asarray(model.covars_, dtype="float64")
+    D = covars.shape[-1]
+    _, logdet = np.linalg.slogdet(covars)
+    last = hmm_result["posterior_probs"].iloc[-1]
+
+    return {
+        "transmat": np.asarray(model.transmat_, dtype="float64"),
+        "means": np.asarray(model.means_, dtype="float64"),
+        "inv_covars": np.linalg.inv(covars),
+        "log_norm": -0.5 * (D * np.log(2.0 * np.pi) + logdet),
+        "scaler_mean": np.asarray(scaler.mean_, dtype="float64"),
+        "scaler_scale": np.asarray(scaler.scale_, dtype="float64"),
+        "filtered": last.to_numpy(dtype="float64"),
+        "last_date": last.name,
+        "lag": lag,
+        # Last `lag` filtered vectors (oldest first) and the emission
+        # likelihoods that followed each of them, for fixed-lag smoothing
+        "history": deque(maxlen=lag),
+        "emissions": deque(maxlen=lag),
+    }
+
+def _emission_likelihood(state: dict, ret: float):
+    x = (np.array([ret, ret * ret]) - state["scaler_mean"]) / state["scaler_scale"]
+    diff = x - state["means"]                                         # (K,D)
+    maha = np.einsum("kd,kde,ke->k", diff, state["inv_covars"], diff)
+    log_b = state["log_norm"] - 0.5 * maha
+    # Rescaling by the max cancels in every normalized quantity below
+    return np.exp(log_b - log_b.max())
+
+def update_regime_filter(state: dict, ret: float, date=None):
+    """
+    Consume one new return (fraction) and update the regime probabilities.
+    Filtering costs O(K^2) per tick; fixed-lag smoothing adds O(K^2 L).
+
+    Returns
+    -------
+    dict with keys:
+        'date' : date of this observation
+        'filtered' : p(s_t | y_1..y_t)
+        'regime' : most likely current state under the filtered probabilities
+        'smoothed' : p(s_{t-L} | y_1..y_t), or None if lag is 0 or not enough ticks yet
+    """
+    b = _emission_likelihood(state, ret)
+    if state["lag"]:
+        state["history"].append(state["filtered"])
+    predicted = state["filtered"] @ state["transmat"]
+    filtered = predicted * b
+    filtered /= filtered.sum()
+    state["filtered"] = filtered
+    state["last_date"] = date
+
+    smoothed = None
+    if state["lag"]:
+        state["emissions"].append(b)
+        if len(state["emissions"]) == state["lag"]:
+            # Backward pass over the window: beta_T = 1, beta_s = A (b_{s+1} * beta_{s+1})
+            beta = np.ones_like(filtered)
+            for b_next in reversed(state["emissions"]):
+                beta = state["transmat"] @ (b_next * beta)
+                beta /= beta.sum()
+            smoothed = state["history"][-state["lag"]] * beta
+            smoothed /= smoothed.sum()
+
+    return {
+        "date": date,
+        "filtered": filtered,
+        "regime": int(filtered.argmax()),
+        "smoothed": smoothed,
+    }
+
+def run_regime_filter(state: dict, returns: pd.Series):
+    """
+    Feed a Series of new returns through the filter in order.
+
+    Returns
+    -------
+    DataFrame indexed by date with filtered probabilities 'state_k', the filtered
+    'regime', and (when lag > 0) 'smoothed_k' columns holding p(s_{t-L} | y_1..y_t).
+    """
+    K = state["transmat"].shape[0]
+    rows = []
+    for date, ret in returns.items():
+        out = update_regime_filter(state, float(ret), date)
+        row = {f"state_{k}": out["filtered"][k] for k in range(K)}
+        row["regime"] = out["regime"]
+        if state["lag"]:
+            sm = out["smoothed"] if out["smoothed"] is not None else np.full(K, np.nan)
+            row.update({f"smoothed_{k}": sm[k] for k in range(K)})
+        rows.append(row)
+    return pd.DataFrame(rows, index=pd.Index(returns.index, name="date"))
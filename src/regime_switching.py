@@ -1,16 +1,356 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from hmmlearn.hmm import GaussianHMM
-from sklearn.preprocessing import StandardScaler
+from hmm_engine import fit_gaussian_hmm, as_model
+from fit_cache import fit_cache_key, cache_get, cache_put
+from instrumentation import span
+
+def _restart_seeds(random_state, n_restarts: int):
+    """Independent, reproducible seeds for each EM restart from one master seed."""
+    if n_restarts == 1:
+        return [random_state]
+    children = np.random.SeedSequence(random_state).spawn(n_restarts)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+def _em_chunk(X, n_states: int, seed, model, n_iter: int, tol: float):
+    """
+    Run up to n_iter EM iterations of a GaussianHMM, continuing from `model`
+    when given (top-level so it can run in a worker process).
+    Returns the model and the log-likelihood of each iteration run.
+    """
+    from hmmlearn.hmm import GaussianHMM
+
+    if model is None:
+        model = GaussianHMM(
+            n_components=n_states,
+            covariance_type="full",
+            n_iter=n_iter,
+            tol=tol,
+            random_state=seed
+        )
+    else:
+        model.init_params = ""
+        model.n_iter = n_iter
+    model.fit(X)
+    return model, list(model.monitor_.history)
+
+def fit_hmm_multistart(
+    X,
+    n_states: int = 2,
+    n_restarts: int = 8,
+    random_state=42,
+    n_iter: int = 200,
+    tol: float = 1e-2,
+    chunk: int = 10,
+    n_jobs: int = 1
+):
+    """
+    Multi-start EM for a GaussianHMM with early stopping of losing restarts.
+
+    All restarts advance in rounds of `chunk` EM iterations, in parallel over
+    `n_jobs` processes. After each round a restart is stopped when even
+    extrapolating its latest per-iteration gain over all remaining iterations
+    cannot reach the best log-likelihood so far (EM gains shrink, so this
+    projection is optimistic). Seeds are spawned from `random_state` and every
+    decision depends only on the restarts' own trajectories, so results are
+    reproducible regardless of `n_jobs`.
+
+    Returns
+    -------
+    best_model : fitted GaussianHMM with the highest log-likelihood
+    restarts : DataFrame with seed, loglik, n_iter and status per restart
+        (status: converged, max_iter or stopped)
+    """
+    seeds = _restart_seeds(random_state, n_restarts)
+    models = [None] * n_restarts
+    history = [[] for _ in range(n_restarts)]
+    status = ["running"] * n_restarts
+
+    pool = ProcessPoolExecutor(max_workers=min(n_jobs, n_restarts)) if n_jobs > 1 else None
+    try:
+        while True:
+            running = [i for i in range(n_restarts) if status[i] == "running"]
+            if not running:
+                break
+            steps = [min(chunk, n_iter - len(history[i])) for i in running]
+            args = (
+                [X] * len(running), [n_states] * len(running), [seeds[i] for i in running],
+                [models[i] for i in running], steps, [tol] * len(running)
+            )
+            results = pool.map(_em_chunk, *args) if pool else map(_em_chunk, *args)
+
+            for i, step, (model, hist) in zip(running, steps, results):
+                models[i] = model
+                history[i].extend(hist)
+                h = history[i]
+                if len(hist) < step or (len(h) >= 2 and h[-1] - h[-2] < tol):
+                    status[i] = "converged"
+                elif len(h) >= n_iter:
+                    status[i] = "max_iter"
+
+            best = max(h[-1] for h in history if h)
+            for i in running:
+                h = history[i]
+                if status[i] != "running":
+                    continue
+                gain = max(h[-1] - h[-1 - min(chunk, len(h) - 1)], 0.0) / min(chunk, len(h) - 1)
+                if h[-1] + gain * (n_iter - len(h)) < best - tol:
+                    status[i] = "stopped"
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    restarts = pd.DataFrame({
+        "seed": seeds,
+        "loglik": [h[-1] for h in history],
+        "n_iter": [len(h) for h in history],
+        "status": status,
+    })
+    candidates = restarts[restarts["status"] != "stopped"]
+    best_idx = int(candidates["loglik"].idxmax())
+    return models[best_idx], restarts
+
+def _n_hmm_params(n_states: int, n_features: int):
+    """Free parameters of a full-covariance Gaussian HMM."""
+    K, D = n_states, n_features
+    return (K - 1) + K * (K - 1) + K * D + K * D * (D + 1) // 2
+
+def _split_state(model):
+    """
+    Initial parameters for a (K+1)-state HMM from a fitted K-state one: the
+    most occupied state is split in two along its principal axis, its start
+    probability and incoming transition mass halved between the copies.
+    """
+    K = model.n_components
+    occupancy = model.get_stationary_distribution()
+    j = int(np.argmax(occupancy))
+    eigval, eigvec = np.linalg.eigh(model.covars_[j])
+    delta = 0.5 * np.sqrt(eigval[-1]) * eigvec[:, -1]
+
+    means = np.vstack([model.means_, model.means_[j] + delta])
+    means[j] -= delta
+    covars = np.concatenate([model.covars_, model.covars_[j][None]])
+    startprob = np.append(model.startprob_, model.startprob_[j] / 2.0)
+    startprob[j] /= 2.0
+    transmat = np.zeros((K + 1, K + 1))
+    transmat[:K, :K] = model.transmat_
+    transmat[K, :K] = model.transmat_[j]
+    transmat[:, K] = transmat[:, j] / 2.0
+    transmat[:, j] /= 2.0
+    return startprob, transmat, means, covars
+
+def _fit_k(X, n_states: int, seed, n_restarts: int = 1, warm_from=None, n_iter: int = 200):
+    """
+    One candidate fit for state-count selection (top-level for the process pool):
+    cold (random init, optional restarts) or warm-started by splitting a state
+    of the fitted (n_states - 1)-state model `warm_from`.
+    """
+    from hmmlearn.hmm import GaussianHMM
+
+    if warm_from is not None:
+        model = GaussianHMM(
+            n_components=n_states,
+            covariance_type="full",
+            n_iter=n_iter,
+            random_state=seed,
+            init_params=""
+        )
+        model.startprob_, model.transmat_, model.means_, model.covars_ = _split_state(warm_from)
+        model.fit(X)
+        return model
+    if n_restarts > 1:
+        model, _ = fit_hmm_multistart(
+            X, n_states=n_states, n_restarts=n_restarts, random_state=seed, n_iter=n_iter
+        )
+        return model
+    model = GaussianHMM(
+        n_components=n_states,
+        covariance_type="full",
+        n_iter=n_iter,
+        random_state=seed
+    )
+    model.fit(X)
+    return model
+
+def select_n_states(
+    X,
+    n_states_grid=range(2, 7),
+    criterion: str = "bic",
+    holdout: float = 0.2,
+    n_restarts: int = 1,
+    random_state=42,
+    n_jobs: int = 1
+):
+    """
+    Choose the number of HMM states by information criterion or held-out
+    likelihood.
+
+    Candidates are fitted on the first (1 - holdout) share of the sample and
+    scored on the rest. Fits run in two concurrent rounds over `n_jobs`
+    processes: every K from a cold start, then every K warm-started by
+    splitting a state of the cold (K-1)-state solution. Each K keeps whichever
+    of its two fits reached the higher training log-likelihood, so the whole
+    grid costs about two rounds of parallel fits instead of a sequential sweep.
+
+    Parameters
+    ----------
+    X : array (T, D)
+        Feature matrix (as built in fit_hmm_regimes).
+    n_states_grid : iterable of int
+        Candidate state counts.
+    criterion : str
+        "bic", "aic" (lowest wins) or "heldout" (highest held-out
+        log-likelihood per observation wins).
+    holdout : float
+        Share of the sample, taken from the end, used for the held-out score.
+        0 fits on the full sample (then only "bic"/"aic" are available).
+
+    Returns
+    -------
+    best_k : int
+    selection : DataFrame indexed by n_states with columns
+        [loglik, n_params, aic, bic, heldout_loglik, init, selected]
+    """
+    if criterion not in ("bic", "aic", "heldout"):
+        raise ValueError(f"criterion must be 'bic', 'aic' or 'heldout', got {criterion!r}")
+    if criterion == "heldout" and not holdout > 0:
+        raise ValueError("criterion='heldout' needs holdout > 0")
+
+    grid = sorted(set(int(k) for k in n_states_grid))
+    X = np.asarray(X, dtype="float64")
+    n_train = int(round(len(X) * (1.0 - holdout)))
+    X_train, X_test = X[:n_train], X[n_train:]
+    seeds = dict(zip(grid, _restart_seeds(random_state, len(grid))))
+
+    pool = ProcessPoolExecutor(max_workers=min(n_jobs, len(grid))) if n_jobs > 1 else None
+    try:
+        run = pool.map if pool else map
+        cold = dict(zip(grid, run(
+            _fit_k, [X_train] * len(grid), grid, [seeds[k] for k in grid],
+            [n_restarts] * len(grid)
+        )))
+        warm_grid = [k for k in grid if k - 1 in cold]
+        warm = dict(zip(warm_grid, run(
+            _fit_k, [X_train] * len(warm_grid), warm_grid, [seeds[k] for k in warm_grid],
+            [1] * len(warm_grid), [cold[k - 1] for k in warm_grid]
+        )))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    records = []
+    for k in grid:
+        candidates = {"cold": cold[k]}
+        if k in warm:
+            candidates["split"] = warm[k]
+        scores = {name: m.score(X_train) for name, m in candidates.items()}
+        init = max(scores, key=scores.get)
+        model, loglik = candidates[init], scores[init]
+        n_params = _n_hmm_params(k, X.shape[1])
+        records.append({
+            "n_states": k,
+            "loglik": loglik,
+            "n_params": n_params,
+            "aic": -2.0 * loglik + 2.0 * n_params,
+            "bic": -2.0 * loglik + n_params * np.log(n_train),
+            "heldout_loglik": model.score(X_test) / len(X_test) if len(X_test) else np.nan,
+            "init": init,
+        })
+
+    selection = pd.DataFrame(records).set_index("n_states")
+    if criterion == "heldout":
+        best_k = int(selection["heldout_loglik"].idxmax())
+    else:
+        best_k = int(selection[criterion].idxmin())
+    selection["selected"] = selection.index == best_k
+    return best_k, selection
+
+def _fit_regime_model(X, n_states, engine, n_restarts, n_jobs, random_state, criterion, holdout):
+    """
+    State-count selection and EM fit behind fit_hmm_regimes.
+    Returns the fitted model, state path, posteriors and fit summaries.
+    """
+    from hmmlearn.hmm import GaussianHMM
+
+    selection = None
+    if not isinstance(n_states, (int, np.integer)):
+        with span("select_n_states", "hmm_fit", candidates=list(n_states)) as info:
+            n_states, selection = select_n_states(
+                X, n_states, criterion=criterion, holdout=holdout,
+                n_restarts=n_restarts, random_state=random_state, n_jobs=n_jobs
+            )
+            info["selected"] = n_states
+
+    restarts = None
+    with span(f"GaussianHMM K={n_states}", "hmm_fit", engine=engine, n_obs=len(X)) as info:
+        if engine == "hmmlearn":
+            if n_restarts > 1:
+                hmm, restarts = fit_hmm_multistart(
+                    X, n_states=n_states, n_restarts=n_restarts,
+                    random_state=random_state, n_iter=200, n_jobs=n_jobs
+                )
+            else:
+                hmm = GaussianHMM(
+                    n_components=n_states,
+                    covariance_type="full",
+                    n_iter=200,
+                    random_state=random_state
+                )
+                hmm.fit(X)
+
+            hidden_states = hmm.predict(X)
+            posterior_probs = hmm.predict_proba(X)
+        elif engine == "native":
+            # Restarts are just more sequences in the batch, each with its own init
+            batch = np.repeat(X[None], n_restarts, axis=0)
+            fit = fit_gaussian_hmm(batch, n_states=n_states, n_iter=200, random_state=random_state)
+            best = int(np.argmax(fit["loglik"]))
+            if n_restarts > 1:
+                restarts = pd.DataFrame({
+                    "loglik": fit["loglik"],
+                    "n_iter": fit["n_iter"],
+                    "status": np.where(fit["converged"], "converged", "max_iter"),
+                })
+            hmm = as_model(fit, best)
+            hidden_states = fit["viterbi"][best]
+            posterior_probs = fit["posteriors"][best]
+        else:
+            raise ValueError(f"engine must be 'hmmlearn' or 'native', got {engine!r}")
+
+        # One forward pass (log-likelihood evaluation) per EM iteration
+        if restarts is not None:
+            info["iterations"] = int(restarts["n_iter"].sum())
+        elif engine == "hmmlearn":
+            info["iterations"] = int(hmm.monitor_.iter)
+        else:
+            info["iterations"] = int(fit["n_iter"][best])
+        info["likelihood_evals"] = info["iterations"]
+        info["restarts"] = n_restarts
+
+    return {
+        "model": hmm,
+        "n_states": n_states,
+        "hidden_states": hidden_states,
+        "posterior_probs": posterior_probs,
+        "restarts": restarts,
+        "selection": selection,
+    }
 
 def fit_hmm_regimes(
     returns: pd.Series,
-    n_states: int = 2,
+    n_states=2,
     asset_name: str = "asset",
     results_dir: str = "../results",
-    figs_dir: str = "../results/figures"
+    figs_dir: str = "../results/figures",
+    make_figures: bool = True,
+    engine: str = "hmmlearn",
+    n_restarts: int = 1,
+    n_jobs: int = 1,
+    random_state=42,
+    criterion: str = "bic",
+    holdout: float = 0.2,
+    cache_dir: str = None
 ):
     """
     Fit a Gaussian Hidden Markov Model (HMM) to infer low-vol/high-vol regimes.
@@ -19,25 +359,52 @@ def fit_hmm_regimes(
     ----------
     returns : pd.Series
         Log returns of the asset.
-    n_states : int
-        Number of latent states (default = 2).
+    n_states : int or iterable of int
+        Number of latent states (default = 2). Given several candidates, the
+        count is chosen with select_n_states (by `criterion`, holding out the
+        last `holdout` share of the sample) and the chosen model is then
+        refitted on the full sample.
     asset_name : str
         Name of the asset (for labeling plots).
     results_dir : str
         Directory to save results (CSV, etc.).
     figs_dir : str
         Directory to save figures.
+    make_figures : bool
+        Draw the regime plots; False skips them without importing pyplot.
+        '<asset>_regimes.csv' and '<asset>_transition_matrix.csv' are always
+        written so the plots can be rendered later (visualization.render_figures).
+    engine : {"hmmlearn", "native"}
+        "native" uses the in-project EM engine (hmm_engine), which returns the
+        Viterbi path and posteriors from its final E-step instead of running
+        separate predict / predict_proba passes.
+    n_restarts : int
+        Number of EM initializations; the best log-likelihood is kept. With
+        "hmmlearn" restarts run in parallel over `n_jobs` processes and losing
+        ones are stopped early (see fit_hmm_multistart); with "native" they are
+        fitted together as one batch.
+    random_state : int
+        Seed (master seed for the restarts when n_restarts > 1).
+    criterion, holdout : state-count selection settings (see select_n_states).
+    cache_dir : str, optional
+        Fit cache directory (see fit_cache). A fit with the same returns,
+        settings and library versions is loaded instead of re-estimated; the
+        CSVs and figures are still written.
 
     Returns
     -------
     dict with keys:
-        'model' : fitted HMM model object
+        'model' : fitted HMM model object (hmmlearn-style attributes for "native")
         'posterior_probs' : DataFrame of state probabilities
         'regime_series' : DataFrame with most likely state per date
         'trans_mat' : transition probability matrix
+        'scaler' : fitted StandardScaler of the [ret, ret^2] features
+        'restarts' : per-restart summary DataFrame (None when n_restarts == 1)
+        'selection' : per-candidate scores from select_n_states (None for a fixed count)
     """
+    from sklearn.preprocessing import StandardScaler
+
     os.makedirs(results_dir, exist_ok=True)
-    os.makedirs(figs_dir, exist_ok=True)
 
     # Create feature matrix (returns + squared returns)
     r = returns.dropna().to_frame(name="ret")
@@ -46,62 +413,51 @@ def fit_hmm_regimes(
     scaler = StandardScaler()
     X = scaler.fit_transform(r[["ret", "ret_sq"]])
 
-    hmm = GaussianHMM(
-        n_components=n_states,
-        covariance_type="full",
-        n_iter=200,
-        random_state=42
-    )
-    hmm.fit(X)
-
-    hidden_states = hmm.predict(X)
-    posterior_probs = hmm.predict_proba(X)
-
-    # 1️⃣ Posterior probability plot
-    plt.figure(figsize=(10, 4))
-    for state in range(n_states):
-        plt.plot(r.index, posterior_probs[:, state], label=f"State {state}")
-    plt.title(f"{asset_name}: Regime posterior probabilities")
-    plt.xlabel("Date")
-    plt.ylabel("Probability")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(os.path.join(figs_dir, f"{asset_name}_regime_probs.png"))
-    plt.close()
-
-    # 2️⃣ Returns scatter colored by regime
-    plt.figure(figsize=(10, 4))
-    for state in range(n_states):
-        mask = hidden_states == state
-        plt.scatter(
-            r.index[mask],
-            r["ret"][mask] * 100,
-            s=6,
-            alpha=0.6,
-            label=f"State {state}"
+    fit = None
+    if cache_dir is not None:
+        spec = {
+            "n_states": n_states if isinstance(n_states, (int, np.integer)) else list(n_states),
+            "engine": engine, "n_restarts": n_restarts, "random_state": random_state,
+            "criterion": criterion, "holdout": holdout,
+        }
+        key = fit_cache_key(r["ret"], spec, "hmm")
+        fit = cache_get(cache_dir, key)
+    if fit is None:
+        fit = _fit_regime_model(
+            X, n_states, engine, n_restarts, n_jobs, random_state, criterion, holdout
         )
-    plt.title(f"{asset_name}: Returns colored by inferred regime")
-    plt.xlabel("Date")
-    plt.ylabel("Return (%)")
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(os.path.join(figs_dir, f"{asset_name}_regime_scatter.png"))
-    plt.close()
-
-    # 3️⃣ Transition matrix heatmap
+        if cache_dir is not None:
+            cache_put(cache_dir, key, fit)
+    hmm, n_states = fit["model"], fit["n_states"]
+    hidden_states, posterior_probs = fit["hidden_states"], fit["posterior_probs"]
+    restarts, selection = fit["restarts"], fit["selection"]
+
     trans_mat = hmm.transmat_
-    plt.figure()
-    plt.imshow(trans_mat, cmap="Blues")
-    for i in range(n_states):
-        for j in range(n_states):
-            plt.text(j, i, f"{trans_mat[i, j]:.2f}", ha="center", va="center")
-    plt.title(f"{asset_name}: HMM transition matrix")
-    plt.xlabel("Next State")
-    plt.ylabel("Current State")
-    plt.colorbar(label="P(transition)")
-    plt.tight_layout()
-    plt.savefig(os.path.join(figs_dir, f"{asset_name}_transition_matrix.png"))
-    plt.close()
+    state_cols = [f"state_{i}" for i in range(n_states)]
+    posterior_df = pd.DataFrame(posterior_probs, index=r.index, columns=state_cols)
+
+    # Numeric artifacts behind the figures, so plots can be rendered on demand
+    posterior_df.assign(ret=r["ret"], hidden_state=hidden_states).to_csv(
+        os.path.join(results_dir, f"{asset_name}_regimes.csv"), index_label="date"
+    )
+    pd.DataFrame(trans_mat, index=state_cols, columns=state_cols).to_csv(
+        os.path.join(results_dir, f"{asset_name}_transition_matrix.csv")
+    )
+    if selection is not None:
+        selection.to_csv(os.path.join(results_dir, f"{asset_name}_n_states_selection.csv"))
+
+    if make_figures:
+        from visualization import (
+            plot_regime_probs, plot_regime_scatter, plot_transition_matrix
+        )
+
+        with span(f"{asset_name} HMM figures", "plot"):
+            # 1️⃣ Posterior probability plot
+            plot_regime_probs(asset_name, posterior_df, figs_dir)
+            # 2️⃣ Returns scatter colored by regime
+            plot_regime_scatter(asset_name, r["ret"], hidden_states, n_states, figs_dir)
+            # 3️⃣ Transition matrix heatmap
+            plot_transition_matrix(asset_name, trans_mat, figs_dir)
 
     # Prepare output
     regime_df = pd.DataFrame({
@@ -111,11 +467,39 @@ def fit_hmm_regimes(
 
     return {
         "model": hmm,
-        "posterior_probs": pd.DataFrame(
-            posterior_probs,
-            index=r.index,
-            columns=[f"state_{i}" for i in range(n_states)]
-        ),
+        "posterior_probs": posterior_df,
         "regime_series": regime_df,
-        "trans_mat": trans_mat
+        "trans_mat": trans_mat,
+        "scaler": scaler,
+        "restarts": restarts,
+        "selection": selection
     }
+
+def fit_hmm_regimes_batch(returns: pd.DataFrame, n_states: int = 2, random_state=42):
+    """
+    Fit one Gaussian HMM per column of a complete (date x asset) returns panel in
+    a single batched EM run (hmm_engine), using the same standardized
+    [ret, ret^2] features as fit_hmm_regimes. No files or figures are written.
+
+    Returns
+    -------
+    {asset: dict with 'model', 'posterior_probs', 'regime_series', 'trans_mat'}
+    """
+    if returns.isna().to_numpy().any():
+        raise ValueError("fit_hmm_regimes_batch needs a complete panel; drop or align missing values first")
+
+    ret = returns.to_numpy(dtype="float64").T                # (B,T)
+    X = np.stack([ret, ret ** 2], axis=-1)                     # (B,T,2)
+    X = (X - X.mean(axis=1, keepdims=True)) / X.std(axis=1, keepdims=True)
+
+    fit = fit_gaussian_hmm(X, n_states=n_states, n_iter=200, random_state=random_state)
+    state_cols = [f"state_{i}" for i in range(n_states)]
+    out = {}
+    for b, asset in enumerate(returns.columns):
+        out[asset] = {
+            "model": as_model(fit, b),
+            "posterior_probs": pd.DataFrame(fit["posteriors"][b], index=returns.index, columns=state_cols),
+            "regime_series": pd.DataFrame({"hidden_state": fit["viterbi"][b]}, index=returns.index.rename("date")),
+            "trans_mat": fit["transmat"][b],
+        }
+    return out
@@ -1,6 +1,13 @@
 import os
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from statsmodels.stats.diagnostic import acorr_ljungbox
+from scipy import stats
+
+# Pipeline stages import this module lazily and only when figures are requested,
+# so headless runs never load pyplot. Every figure can also be redrawn later from
+# the numeric artifacts the stages save (see render_figures).
 
 def plot_conditional_vol_vs_realized(
     asset_name: str,
@@ -31,3 +38,202 @@ def plot_conditional_vol_vs_realized(
     plt.tight_layout()
     plt.savefig(os.path.join(figs_dir, f"{asset_name}_cond_vs_realized.png"))
     plt.close()
+
+def plot_garch_volatility(
+    asset_name: str,
+    model_name: str,
+    cond_vol: pd.Series,
+    figs_dir: str = "../results/figures"
+):
+    """
+    Line plot of one model's conditional volatility (% terms).
+    """
+    os.makedirs(figs_dir, exist_ok=True)
+
+    plt.figure()
+    plt.plot(cond_vol.index, cond_vol, label=f"{model_name} cond. vol")
+    plt.title(f"{asset_name}: {model_name} conditional volatility")
+    plt.xlabel("Date")
+    plt.ylabel("Vol (%)")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(os.path.join(figs_dir, f"{asset_name}_{model_name}_volatility.png"))
+    plt.close()
+
+def plot_residual_qq(
+    asset_name: str,
+    model_name: str,
+    std_resid: pd.Series,
+    figs_dir: str = "../results/figures"
+):
+    """
+    QQ-plot of standardized residuals, annotated with the Ljung-Box p-value at lag 10.
+    """
+    os.makedirs(figs_dir, exist_ok=True)
+
+    std_resid = std_resid.dropna()
+    lb = acorr_ljungbox(std_resid, lags=[10], return_df=True)
+    lb_p = lb["lb_pvalue"].to_numpy()
+
+    plt.figure()
+    stats.probplot(std_resid, dist="norm", plot=plt)
+    plt.title(
+        f"{asset_name}: {model_name} standardized residual QQ-plot\n"
+        f"Ljung-Box p(10)={lb_p[0]:.3f}"
+    )
+    plt.tight_layout()
+    plt.savefig(os.path.join(figs_dir, f"{asset_name}_{model_name}_qqplot.png"))
+    plt.close()
+
+def plot_regime_probs(
+    asset_name: str,
+    posterior_probs: pd.DataFrame,
+    figs_dir: str = "../results/figures"
+):
+    """
+    Posterior probability of each HMM state over time.
+    """
+    os.makedirs(figs_dir, exist_ok=True)
+
+    plt.figure(figsize=(10, 4))
+    for state in range(posterior_probs.shape[1]):
+        plt.plot(posterior_probs.index, posterior_probs.iloc[:, state], label=f"State {state}")
+    plt.title(f"{asset_name}: Regime posterior probabilities")
+    plt.xlabel("Date")
+    plt.ylabel("Probability")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(os.path.join(figs_dir, f"{asset_name}_regime_probs.png"))
+    plt.close()
+
+def plot_regime_scatter(
+    asset_name: str,
+    returns: pd.Series,
+    hidden_states,
+    n_states: int,
+    figs_dir: str = "../results/figures"
+):
+    """
+    Returns scatter colored by the most likely HMM state.
+    """
+    os.makedirs(figs_dir, exist_ok=True)
+
+    hidden_states = np.asarray(hidden_states)
+    plt.figure(figsize=(10, 4))
+    for state in range(n_states):
+        mask = hidden_states == state
+        plt.scatter(
+            returns.index[mask],
+            returns[mask] * 100,
+            s=6,
+            alpha=0.6,
+            label=f"State {state}"
+        )
+    plt.title(f"{asset_name}: Returns colored by inferred regime")
+    plt.xlabel("Date")
+    plt.ylabel("Return (%)")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(os.path.join(figs_dir, f"{asset_name}_regime_scatter.png"))
+    plt.close()
+
+def plot_transition_matrix(
+    asset_name: str,
+    trans_mat,
+    figs_dir: str = "../results/figures"
+):
+    """
+    Heatmap of the HMM transition matrix with annotated probabilities.
+    """
+    os.makedirs(figs_dir, exist_ok=True)
+
+    trans_mat = np.asarray(trans_mat)
+    n_states = trans_mat.shape[0]
+    plt.figure()
+    plt.imshow(trans_mat, cmap="Blues")
+    for i in range(n_states):
+        for j in range(n_states):
+            plt.text(j, i, f"{trans_mat[i, j]:.2f}", ha="center", va="center")
+    plt.title(f"{asset_name}: HMM transition matrix")
+    plt.xlabel("Next State")
+    plt.ylabel("Current State")
+    plt.colorbar(label="P(transition)")
+    plt.tight_layout()
+    plt.savefig(os.path.join(figs_dir, f"{asset_name}_transition_matrix.png"))
+    plt.close()
+
+def plot_forecast_rmse(
+    asset_name: str,
+    summary: pd.DataFrame,
+    figs_dir: str = "../results/figures"
+):
+    """
+    Bar plot of forecast RMSE by model (summary from evaluate_forecasts).
+    """
+    os.makedirs(figs_dir, exist_ok=True)
+
+    plt.figure()
+    plt.bar(summary["model"], summary["rmse"], color="skyblue")
+    plt.title(f"{asset_name}: Forecast RMSE vs Realized Volatility")
+    plt.ylabel("RMSE (pct vol)")
+    plt.tight_layout()
+    plt.savefig(os.path.join(figs_dir, f"{asset_name}_forecast_rmse.png"))
+    plt.close()
+
+def render_figures(
+    asset_name: str,
+    results_dir: str = "../results",
+    figs_dir: str = "../results/figures"
+):
+    """
+    Draw every figure for an asset from the numeric artifacts saved by a
+    (possibly headless) pipeline run. Artifacts that are missing are skipped.
+
+    Returns
+    -------
+    list of figure file names that were written.
+    """
+    def _read(name, **kwargs):
+        path = os.path.join(results_dir, f"{asset_name}_{name}.csv")
+        if not os.path.exists(path):
+            return None
+        return pd.read_csv(path, **kwargs)
+
+    written = []
+    cond_vol = _read("cond_vol", index_col=0, parse_dates=True)
+    if cond_vol is not None:
+        for model_name in cond_vol.columns:
+            plot_garch_volatility(asset_name, model_name, cond_vol[model_name], figs_dir)
+            written.append(f"{asset_name}_{model_name}_volatility.png")
+
+    std_resid = _read("std_resid", index_col=0, parse_dates=True)
+    if std_resid is not None:
+        for model_name in std_resid.columns:
+            plot_residual_qq(asset_name, model_name, std_resid[model_name], figs_dir)
+            written.append(f"{asset_name}_{model_name}_qqplot.png")
+
+    realized = _read("realized_vol", index_col=0, parse_dates=True)
+    if cond_vol is not None and realized is not None:
+        cond_vol_dict = {m: cond_vol[m].dropna() for m in cond_vol.columns}
+        plot_conditional_vol_vs_realized(asset_name, cond_vol_dict, realized.iloc[:, 0], figs_dir)
+        written.append(f"{asset_name}_cond_vs_realized.png")
+
+    regimes = _read("regimes", index_col=0, parse_dates=True)
+    if regimes is not None:
+        probs = regimes.filter(like="state_")
+        plot_regime_probs(asset_name, probs, figs_dir)
+        plot_regime_scatter(asset_name, regimes["ret"], regimes["hidden_state"],
+                            probs.shape[1], figs_dir)
+        written += [f"{asset_name}_regime_probs.png", f"{asset_name}_regime_scatter.png"]
+
+    trans_mat = _read("transition_matrix", index_col=0)
+    if trans_mat is not None:
+        plot_transition_matrix(asset_name, trans_mat.to_numpy(), figs_dir)
+        written.append(f"{asset_name}_transition_matrix.png")
+
+    summary = _read("forecast_eval")
+    if summary is not None:
+        plot_forecast_rmse(asset_name, summary, figs_dir)
+        written.append(f"{asset_name}_forecast_rmse.png")
+
+    return written